@@ -1,20 +1,30 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from db import get_db_connection, init_db  # Added init_db import
-from bot import publish_post
-from apscheduler.schedulers.background import BackgroundScheduler
+from db import get_db_connection, get_pool_stats, init_db, read_posts_fingerprint  # Added init_db import
+from cache import read_cache, fingerprint_cache, invalidate_posts, invalidate_settings, get_cache_stats
+from limiter import limiter_status
+from jobs import enqueue_job, get_job, job_event_stream, start_job_workers
+from startup import startup
+from health import prober, HEALTH_STATS_INTERVAL
+import feeds
+import bulk
+import enrich
+from responses import init_compression, init_json, json_response
 import os
 import atexit
+import base64
+import hashlib
+import itertools
+import json
+from datetime import datetime, timezone
 from functools import wraps
 
 app = Flask(__name__)
+init_json(app)
+init_compression(app)
 # Enable CORS for all domains (or restrict to your specific Netlify domain for extra security)
 CORS(app)
 
-# Initialize database tables on startup
-print("🔧 Initializing database tables...")
-init_db() 
-
 # --- SECURITY ---
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "wavesignals@2025") # Default fallback, User must change this!
 
@@ -30,14 +40,37 @@ def require_auth(f):
 # --- AUTOMATION (INTERNAL CRON) ---
 # Runs the bot every 24 hours to generate a new post
 def daily_auto_post():
+   from bot import publish_post
    print("⏰ Internal Cron Triggered: Publishing new post...")
    publish_post()
 
-# Start Scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=daily_auto_post, trigger="interval", hours=12) 
-scheduler.start()
-atexit.register(lambda: scheduler.shutdown())
+scheduler = None  # Created by start_scheduler during startup
+
+def start_scheduler():
+    # bot (LLM clients, requests) and APScheduler are imported here, off the import path
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from bot import warm_trend_cache, TRENDS_TTL_HOURS
+    global scheduler
+    if scheduler is not None:
+        return
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(func=daily_auto_post, trigger="interval", hours=12)
+    # Keep trend research warm so generation never waits on it; every worker schedules this, but a
+    # lease (limiter.exclusive) lets only one of them do the research
+    scheduler.add_job(func=warm_trend_cache, trigger="interval", hours=TRENDS_TTL_HOURS, next_run_time=datetime.now())
+    scheduler.start()
+    atexit.register(lambda: scheduler.shutdown())
+
+# DB migrations, scheduler and job workers run after the server is up (see startup.py)
+print("🔧 Initializing database tables...")
+prober.add_check("scheduler", lambda: scheduler is not None and scheduler.running)
+startup.step("health_prober", prober.start)
+startup.step("database", init_db)
+startup.step("derived_fields", enrich.backfill)  # Rows written before migration 0004
+startup.step("scheduler", start_scheduler)
+# Background workers for the generation job queue (see jobs.py)
+startup.step("job_workers", start_job_workers)
+startup.start()
 
 @app.route('/')
 def home():
@@ -47,45 +80,40 @@ def home():
         "scheduler": "Running (Daily)"
     })
 
+@app.route('/startupz', methods=['GET'])
+def startupz():
+    """Startup probe: 200 once deferred startup finished, 503 with per-step status until then"""
+    status = startup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/livez', methods=['GET'])
+def livez():
+    """Liveness: the process is serving requests. Touches nothing else."""
+    return "ok", 200, {'Content-Type': 'text/plain', 'Cache-Control': 'no-store'}
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness from the background prober (see health.py): never queries Postgres itself"""
+    readiness = prober.readiness()
+    ready = readiness["ok"] and startup.ready()
+    return jsonify({"ready": ready, "startup_complete": startup.ready(), **readiness}), 200 if ready else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint to keep Space alive and monitor system"""
+    """Health check endpoint to keep Space alive and monitor system.
+
+    Served from the prober's snapshot: post stats are refreshed at most every HEALTH_STATS_INTERVAL seconds.
+    """
     from datetime import datetime
+    from llm import get_llm_stats
     
     try:
-        # Check database connection
-        conn = get_db_connection()
-        db_status = "connected" if conn else "disconnected"
-        recent_posts = 0
-        last_post = None
-        total_posts = 0
-        
-        if conn:
-            try:
-                cur = conn.cursor()
-                # Get total posts
-                cur.execute("SELECT COUNT(*) as count FROM posts")
-                total_posts = cur.fetchone()['count']
-                
-                # Get posts from last 24 hours
-                cur.execute("SELECT COUNT(*) as count FROM posts WHERE date > NOW() - INTERVAL '24 hours'")
-                recent_posts = cur.fetchone()['count']
-                
-                # Get last post info
-                cur.execute("SELECT title, date FROM posts ORDER BY date DESC LIMIT 1")
-                last_post_data = cur.fetchone()
-                if last_post_data:
-                    last_post = {
-                        "title": last_post_data['title'],
-                        "date": last_post_data['date'].isoformat()
-                    }
-                cur.close()
-                conn.close()
-            except Exception as e:
-                print(f"Error querying database in health check: {e}")
-        
+        readiness = prober.readiness()
+        db_check = readiness["checks"].get("database", {})
+        stats = prober.stats() or {}
+
         # Check scheduler status
-        scheduler_status = "running" if scheduler.running else "stopped"
+        scheduler_status = "running" if scheduler and scheduler.running else "stopped"
         next_job = None
         try:
             jobs = scheduler.get_jobs()
@@ -103,10 +131,15 @@ def health_check():
             "message": "WaveSignals Backend is running",
             "timestamp": datetime.now().isoformat(),
             "database": {
-                "status": db_status,
-                "total_posts": total_posts,
-                "posts_24h": recent_posts,
-                "last_post": last_post
+                "status": "connected" if db_check.get("ok") else "disconnected",
+                "total_posts": stats.get("total_posts", 0),
+                "posts_24h": stats.get("posts_24h", 0),
+                "published_posts": stats.get("published_posts", 0),
+                "posts_by_tag": stats.get("posts_by_tag", {}),
+                "last_post": stats.get("last_post"),
+                "stats_refreshed_at": datetime.fromtimestamp(stats["refreshed_at"]).isoformat() if stats else None,
+                "stats_max_age_seconds": HEALTH_STATS_INTERVAL,
+                "pool": get_pool_stats()
             },
             "scheduler": {
                 "status": scheduler_status,
@@ -115,8 +148,11 @@ def health_check():
             },
             "apis": {
                 "gemini_configured": api_key_configured,
-                "gemini_key_preview": gemini_key[:15] + "..." if gemini_key else "NOT SET"
+                "gemini_key_preview": gemini_key[:15] + "..." if gemini_key else "NOT SET",
+                "llm_providers": get_llm_stats()
             },
+            "readiness": readiness,
+            "startup": startup.status(),
             "version": "2.2"
         }
         
@@ -136,8 +172,182 @@ def health_check():
 def verify_auth():
     return jsonify({"valid": True})
 
+# --- CONDITIONAL GET (ETag / Last-Modified) ---
+def make_etag(*parts):
+    """Strong ETag value from a cheap fingerprint (never from full bodies)"""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+
+def as_utc(ts):
+    if ts is None:
+        return None
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response if the client's validators still match, else None.
+
+    If-None-Match wins over If-Modified-Since, as RFC 9110 requires.
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)  # Weak comparison; compressed variants carry W/
+    elif request.if_modified_since and last_modified:
+        matched = as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return with_validators(app.response_class(status=304), etag, last_modified)
+
+def with_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = as_utc(last_modified)
+    # Let CDNs store it but always revalidate (cheap now that 304s exist)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+def respond_posts(payload, etag, last_modified):
+    response = json_response(payload)
+    return with_validators(response, etag, last_modified) if etag else response
+
+def get_posts_fingerprint():
+    """(published count, changes, last change) of the posts table, or None if the DB is down.
+
+    Read from the database at most every POSTS_FINGERPRINT_TTL seconds (and right after this worker's
+    own writes), so gunicorn workers agree about it, and about ETags, within that window.
+    """
+    hit, fingerprint = fingerprint_cache.get("posts")
+    if hit:
+        return fingerprint
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        fingerprint = read_posts_fingerprint(cur)
+        cur.close()
+        conn.close()
+        fingerprint_cache.set("posts", fingerprint)
+        return fingerprint
+    except Exception as e:
+        print(f"Error computing posts fingerprint: {e}")
+        return None
+
+# --- SITEMAPS AND FEEDS (streamed, see feeds.py) ---
+def xml_response(kind, chunks_for, mimetype='application/xml', fingerprint=None):
+    """Stream XML with ETag/Last-Modified derived from the posts fingerprint, or from a narrower
+    (count, digest, last change) one such as feeds.shard_fingerprint
+    """
+    fingerprint = fingerprint or get_posts_fingerprint()
+    if fingerprint is None:
+        return jsonify({"error": "Database error"}), 500
+    count, changes, last_modified = fingerprint
+    etag = make_etag(kind, count, changes, last_modified)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    response = Response(stream_with_context(chunks_for(count, last_modified)), mimetype=mimetype)
+    return with_validators(response, etag, last_modified)
+
+@app.route('/sitemap.xml', methods=['GET'])
+def sitemap_index_xml():
+    return xml_response("sitemap-index", lambda count, _: feeds.sitemap_index(count))
+
+@app.route('/sitemap-posts-<int:shard>.xml', methods=['GET'])
+def sitemap_shard_xml(shard):
+    fingerprint = get_posts_fingerprint()
+    if fingerprint is None:
+        return jsonify({"error": "Database error"}), 500
+    if not 1 <= shard <= feeds.shard_count(fingerprint[0]):
+        return jsonify({"error": "Sitemap not found"}), 404
+    # Recomputed only when the posts fingerprint moves; the ETag only changes with this shard's rows
+    cache_key = ("posts", "sitemap-shard", shard, fingerprint)
+    hit, shard_fingerprint = read_cache.get(cache_key)
+    if not hit:
+        try:
+            shard_fingerprint = feeds.shard_fingerprint(shard)
+        except Exception as e:
+            print(f"Error computing sitemap shard fingerprint: {e}")
+            return jsonify({"error": "Database error"}), 500
+        read_cache.set(cache_key, shard_fingerprint)
+    return xml_response(f"sitemap-{shard}", lambda count, _: feeds.sitemap_shard(shard), fingerprint=shard_fingerprint)
+
+@app.route('/rss.xml', methods=['GET'])
+def rss_xml():
+    return xml_response("rss", lambda _, last_modified: feeds.rss_feed(last_modified), 'application/rss+xml')
+
+@app.route('/atom.xml', methods=['GET'])
+def atom_xml():
+    return xml_response("atom", lambda _, last_modified: feeds.atom_feed(last_modified), 'application/atom+xml')
+
+# --- POST LISTING (keyset pagination + projection) ---
+POST_COLUMNS = (
+    'id', 'slug', 'title', 'excerpt', 'content', 'published', 'date', 'created_at', 'updated_at', 'author',
+    'tags', 'meta_description', 'keywords', 'hashtags', 'search_queries', 'image',
+    'word_count', 'reading_minutes', 'toc', 'plain_excerpt', 'content_hash'
+)  # Public columns; search_vector, minhash and lsh_bands are index data and never served
+POSTS_PAGE_DEFAULT = 20
+POSTS_PAGE_MAX = 100
+
+def encode_cursor(post_date, post_id):
+    """Opaque cursor for the (date, id) keyset; posts.date is NOT NULL (migration 0007)"""
+    raw = json.dumps([post_date.isoformat(), post_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on garbage"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        post_date, post_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(post_date), int(post_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_post_fields(fields_param):
+    """Validate ?fields=a,b,c against the posts columns (None = all columns)"""
+    if not fields_param:
+        return None
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in POST_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
 @app.route('/api/posts', methods=['GET'])
 def get_posts():
+    """List published posts, newest first.
+
+    Optional query params:
+      fields=slug,title,...  only return these columns (skip heavy `content`)
+      limit=N / cursor=...   keyset pagination on (date, id); response carries `next_cursor`
+    Without limit/cursor the full list is returned, as before.
+    """
+    try:
+        fields = parse_post_fields(request.args.get('fields'))
+        paginate = 'limit' in request.args or 'cursor' in request.args
+        limit = min(max(int(request.args.get('limit', POSTS_PAGE_DEFAULT)), 1), POSTS_PAGE_MAX)
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Answer revalidations before touching the payload at all
+    fingerprint = get_posts_fingerprint()
+    # Keyed by the fingerprint too, so another worker's write is picked up within POSTS_FINGERPRINT_TTL
+    cache_key = ("posts", tuple(fields) if fields else None, cursor, limit if paginate else None, fingerprint)
+    etag = last_modified = None
+    if fingerprint:
+        last_modified = fingerprint[2]
+        etag = make_etag(cache_key)
+        unchanged = not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
+
+    hit, payload = read_cache.get(cache_key)
+    if hit:
+        return respond_posts(payload, etag, last_modified)
+
+    # Always select the keyset columns; they are dropped again if not requested
+    select_cols = ', '.join(fields + [c for c in ('date', 'id') if c not in fields] if fields else POST_COLUMNS)
+
     conn = get_db_connection()
     if not conn:
         print("DB Connection failed in get_posts")
@@ -145,36 +355,139 @@ def get_posts():
     
     try:
         cur = conn.cursor()
-        # Fetch published posts, newest first
-        cur.execute("SELECT * FROM posts WHERE published = TRUE ORDER BY date DESC")
+        query = f"SELECT {select_cols} FROM posts WHERE published = TRUE"
+        params = []
+        if cursor:
+            query += " AND (date, id) < (%s, %s)"
+            params.extend(cursor)
+        # Fetch published posts, newest first (served by idx_posts_published_date_id)
+        query += " ORDER BY date DESC, id DESC"
+        if paginate:
+            query += " LIMIT %s"
+            params.append(limit + 1)
+        cur.execute(query, params)
         posts = cur.fetchall()
         cur.close()
         conn.close()
-        return jsonify({"posts": posts})
+
+        next_cursor = None
+        if paginate and len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1]['date'], posts[-1]['id'])
+
+        if fields:
+            posts = [{f: p[f] for f in fields} for p in posts]
+
+        payload = {"posts": posts, "next_cursor": next_cursor} if paginate else {"posts": posts}
+        read_cache.set(cache_key, payload)
+        return respond_posts(payload, etag, last_modified)
     except Exception as e:
         print(f"Error serving posts: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/posts/<slug>', methods=['GET'])
-def get_post(slug):
+# --- SEARCH (Postgres full-text, see posts.search_vector in db.init_db) ---
+SEARCH_PAGE_DEFAULT = 10
+SEARCH_PAGE_MAX = 50
+SEARCH_QUERY_MAX_CHARS = 200
+
+@app.route('/api/search', methods=['GET'])
+def search_posts():
+    """Ranked full-text search over published posts.
+
+    Query params: q (required), limit, offset. Snippets wrap matches in <mark>.
+    """
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    if len(q) > SEARCH_QUERY_MAX_CHARS:
+        return jsonify({"error": f"Query too long (max {SEARCH_QUERY_MAX_CHARS} chars)"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_PAGE_DEFAULT)), 1), SEARCH_PAGE_MAX)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+
+    # Under the "posts" namespace so every post write invalidates search results too; the fingerprint
+    # covers writes made by other workers
+    cache_key = ("posts", "search", q.lower(), limit, offset, get_posts_fingerprint())
+    hit, payload = read_cache.get(cache_key)
+    if hit:
+        return jsonify(payload)
+
     conn = get_db_connection()
     if not conn:
         return jsonify({"error": "Database error"}), 500
-    
+
     try:
         cur = conn.cursor()
-        cur.execute("SELECT * FROM posts WHERE slug = %s", (slug,))
-        post = cur.fetchone()
+        # Rank on the GIN-indexed vector first; ts_headline only runs on the page we return
+        cur.execute("""
+            SELECT id, slug, title, excerpt, date, tags, rank, total,
+                   ts_headline('english', regexp_replace(content, '<[^>]+>', ' ', 'g'), query,
+                               'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10') AS snippet
+            FROM (
+                SELECT p.id, p.slug, p.title, p.excerpt, p.date, p.tags, p.content, query,
+                       ts_rank_cd(p.search_vector, query) AS rank,
+                       COUNT(*) OVER () AS total
+                FROM posts p, websearch_to_tsquery('english', %s) AS query
+                WHERE p.published = TRUE AND p.search_vector @@ query
+                ORDER BY rank DESC, p.date DESC
+                LIMIT %s OFFSET %s
+            ) hits
+            ORDER BY rank DESC, date DESC
+        """, (q, limit, offset))
+        rows = cur.fetchall()
         cur.close()
         conn.close()
-        
-        if post:
-            return jsonify(post)
-        else:
-            return jsonify({"error": "Post not found"}), 404
+
+        total = rows[0]['total'] if rows else 0
+        results = [{k: v for k, v in row.items() if k != 'total'} for row in rows]
+        for r in results:
+            r['rank'] = float(r['rank'])
+        payload = {
+            "query": q,
+            "results": results,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if offset + limit < total else None
+        }
+        read_cache.set(cache_key, payload)
+        return jsonify(payload)
     except Exception as e:
+        print(f"Error searching posts: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/posts/<slug>', methods=['GET'])
+def get_post(slug):
+    cache_key = ("post", slug, get_posts_fingerprint())  # Fingerprint: see get_posts
+    hit, post = read_cache.get(cache_key)
+    if not hit:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database error"}), 500
+
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {', '.join(POST_COLUMNS)} FROM posts WHERE slug = %s", (slug,))
+            post = cur.fetchone()
+            cur.close()
+            conn.close()
+            read_cache.set(cache_key, post)  # Misses are cached too; create_post invalidates the slug
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    if not post:
+        return jsonify({"error": "Post not found"}), 404
+
+    last_modified = post.get('updated_at') or post.get('date')
+    # content_hash: enrich.backfill rewrites content without touching updated_at
+    etag = make_etag(post['id'], last_modified, post.get('published'), post.get('content_hash'))
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify(post), etag, last_modified)
+
 @app.route('/api/posts', methods=['POST'])
 @require_auth
 def create_post():
@@ -187,20 +500,24 @@ def create_post():
     if not conn: return jsonify({"error": "DB Error"}), 500
     
     try:
+        content, derived = enrich.derive(data['content'], data.get('excerpt'))
         cur = conn.cursor()
         cur.execute("""
-            INSERT INTO posts (slug, title, excerpt, content, tags, image, published, date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+            INSERT INTO posts (slug, title, excerpt, content, tags, image, published, date,
+                               word_count, reading_minutes, toc, plain_excerpt, content_hash, minhash, lsh_bands)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (
             data['slug'], data['title'], data.get('excerpt', ''), 
-            data['content'], data.get('tags', ''), data.get('image', ''),
-            data.get('published', True)
+            content, data.get('tags', ''), data.get('image', ''),
+            data.get('published', True),
+            *(derived[c] for c in enrich.DERIVED_COLUMNS)
         ))
         new_id = cur.fetchone()['id']
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_posts(post_id=new_id, slug=data['slug'])
         return jsonify({"message": "Created", "id": new_id}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -209,23 +526,33 @@ def create_post():
 @require_auth
 def update_post(id):
     data = request.json
+    required = ['title', 'slug', 'content']
+    if not all(k in data for k in required):
+        return jsonify({"error": "Missing required fields"}), 400
+    
     conn = get_db_connection()
     if not conn: return jsonify({"error": "DB Error"}), 500
     
     try:
+        content, derived = enrich.derive(data['content'], data.get('excerpt'))
         cur = conn.cursor()
         cur.execute("""
             UPDATE posts 
-            SET title=%s, slug=%s, excerpt=%s, content=%s, tags=%s, image=%s, published=%s
+            SET title=%s, slug=%s, excerpt=%s, content=%s, tags=%s, image=%s, published=%s,
+                word_count=%s, reading_minutes=%s, toc=%s, plain_excerpt=%s, content_hash=%s,
+                minhash=%s, lsh_bands=%s, updated_at=NOW()
             WHERE id = %s
         """, (
             data['title'], data['slug'], data.get('excerpt', ''), 
-            data['content'], data.get('tags', ''), data.get('image', ''),
-            data.get('published', True), id
+            content, data.get('tags', ''), data.get('image', ''),
+            data.get('published', True),
+            *(derived[c] for c in enrich.DERIVED_COLUMNS), id
         ))
         conn.commit()
         cur.close()
         conn.close()
+        # Cached by id covers the old slug if it was renamed
+        invalidate_posts(post_id=id, slug=data['slug'])
         return jsonify({"message": "Updated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -242,24 +569,64 @@ def delete_post(id):
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_posts(post_id=id)
         return jsonify({"message": "Deleted"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/settings', methods=['GET'])
-def get_settings():
-    conn = get_db_connection()
-    if not conn: return jsonify({"error": "DB Error"}), 500
-    
+# --- BULK IMPORT/EXPORT (NDJSON, see bulk.py) ---
+@app.route('/api/posts/export', methods=['GET'])
+@require_auth
+def export_posts():
+    lines = bulk.export_ndjson(published_only=request.args.get('published') == 'true')
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT config FROM settings WHERE id = 1")
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        return jsonify(row['config'] if row else {})
+        first = next(lines, "")  # Opens the cursor, so a DB failure is still a proper 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    headers = {'Content-Disposition': 'attachment; filename="posts.ndjson"'}
+    return Response(stream_with_context(itertools.chain([first], lines)), mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/api/posts/import', methods=['POST'])
+@require_auth
+def import_posts():
+    """NDJSON body (one post per line), or a legacy JSON store when sent as application/json"""
+    batch_size = request.args.get('batch_size', type=int) or bulk.BULK_BATCH_SIZE
+    try:
+        if request.mimetype == 'application/json':
+            rows = bulk.legacy_rows(request.get_json())
+        else:
+            rows = bulk.read_ndjson(request.stream)
+        summary = bulk.import_rows(rows, batch_size)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(summary), 200
+
+@app.route('/api/settings', methods=['GET'])
+def get_settings():
+    hit, cached = read_cache.get(("settings",))
+    if hit:
+        config, etag = cached
+    else:
+        conn = get_db_connection()
+        if not conn: return jsonify({"error": "DB Error"}), 500
+
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT config FROM settings WHERE id = 1")
+            row = cur.fetchone()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        config = row['config'] if row else {}
+        # Settings are a small dict; hashing it once per cache fill is the cheap fingerprint
+        etag = make_etag(json.dumps(config, sort_keys=True, default=str))
+        read_cache.set(("settings",), (config, etag))
+
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify(config), etag)
 
 @app.route('/api/settings', methods=['PUT'])
 @require_auth
@@ -286,10 +653,17 @@ def update_settings():
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_settings()
         return jsonify({"message": "Settings Updated", "config": updated_config}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Read-cache and connection-pool counters (hits, misses, evictions...)"""
+    from llm import get_llm_cache_stats
+    return jsonify({"cache": get_cache_stats(), "pool": get_pool_stats(), "llm_cache": get_llm_cache_stats()})
+
 # === AI DIAGNOSTIC ===
 @app.route('/api/test-ai-simple', methods=['POST'])
 @require_auth  
@@ -326,98 +700,104 @@ def test_ai_simple():
 # === BOT ENDPOINTS ===
 @app.route('/api/rate-limit-status', methods=['GET'])
 def rate_limit_status():
-    """Get current rate limit status"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
+    """Get current rate limit status (token bucket in rate_limits, see limiter.py)"""
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT created_at FROM posts ORDER BY created_at DESC LIMIT 1")
-        last_post = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if last_post:
-            from datetime import datetime, timezone
-            last_post_time = last_post['created_at']
-            
-            if last_post_time.tzinfo is None:
-                last_post_time = last_post_time.replace(tzinfo=timezone.utc)
-            
-            now = datetime.now(timezone.utc)
-            hours_since = (now - last_post_time).total_seconds() / 3600
-            hours_remaining = max(0, 23 - hours_since)
-            can_post = hours_since >= 23
-            
-            return jsonify({
-                "success": True,
-                "hours_since_last": hours_since,
-                "hours_remaining": hours_remaining,
-                "can_post": can_post,
-                "last_post_time": last_post_time.isoformat()
-            })
-        else:
-            return jsonify({
-                "success": True,
-                "hours_since_last": None,
-                "hours_remaining": 0,
-                "can_post": True,
-                "last_post_time": None
-            })
+        status = limiter_status()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    hours_since = None
+    if status["last_post_time"]:
+        last_post_time = as_utc(datetime.fromisoformat(status["last_post_time"]))
+        hours_since = (datetime.now(timezone.utc) - last_post_time).total_seconds() / 3600
+    return jsonify({"success": True, "hours_since_last": hours_since, **status})
+
 @app.route('/api/generate-post', methods=['POST'])
 @require_auth
 def generate_post_api():
-    """Manual trigger for AI post generation with emergency override support"""
-    try:
-        from bot import publish_post
-        import traceback
-        
-        # Check for emergency override header
-        emergency_override = request.headers.get('X-Emergency-Override') == 'true'
-        
-        if emergency_override:
-            print("🚨 EMERGENCY OVERRIDE: Manual post generation with rate limit bypass")
-        else:
-            print("🚀 Manual post generation triggered...")
-        
-        result = publish_post(emergency_override=emergency_override)
-        
-        if isinstance(result, dict) and result.get("success"):
-            return jsonify({
-                'success': True,
-                'status': 'success', 
-                'message': 'Post generated and published successfully',
-                'post_id': result.get("id"),
-                'title': result.get("title")
-            }), 200
-        elif isinstance(result, dict) and not result.get("success"):
-            return jsonify({
-                'success': False,
-                'status': 'error',
-                'error': result.get('error'),
-                'message': f"Generation failed: {result.get('error')}"
-            }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'status': 'error', 
-                'message': 'publish_post returned unexpected format - check logs'
-            }), 500
-            
-    except Exception as e:
-        error_trace = traceback.format_exc()
-        print(f"❌ Post generation error: {error_trace}")
+    """Queue AI post generation (emergency override supported); poll /api/jobs/<id> for progress.
+    With `Accept: text/event-stream` the response streams the job's progress instead.
+    """
+    # Check for emergency override header
+    emergency_override = request.headers.get('X-Emergency-Override') == 'true'
+    
+    if emergency_override:
+        print("🚨 EMERGENCY OVERRIDE: Manual post generation with rate limit bypass")
+    else:
+        print("🚀 Manual post generation triggered...")
+    
+    job_id = enqueue_job('post', {"emergency_override": emergency_override})
+    if job_id is None:
         return jsonify({
             'success': False,
-            'status': 'error', 
-            'message': str(e),
-            'traceback': error_trace
+            'status': 'error',
+            'message': 'Could not queue generation job - database unavailable'
         }), 500
 
+    if request.accept_mimetypes.best == 'text/event-stream':
+        return sse_response(job_id)
+
+    return jsonify({
+        'success': True,
+        'status': 'queued',
+        'message': 'Post generation queued',
+        'job_id': job_id,
+        'status_url': f"/api/jobs/{job_id}",
+        'events_url': f"/api/jobs/{job_id}/events"
+    }), 202
+
+@app.route('/api/generate-batch', methods=['POST'])
+@require_auth
+def generate_batch_api():
+    """Queue generation of several posts (drafts by default); body: {count, concurrency, categories, publish}.
+    Publishing batches obey the publish rate limit unless X-Emergency-Override: true is sent.
+    """
+    from batch import BATCH_CONCURRENCY, BATCH_MAX_POSTS
+
+    data = request.json or {}
+    try:
+        count = int(data.get('count', 0))
+        concurrency = int(data.get('concurrency', BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count and concurrency must be integers"}), 400
+    if not 1 <= count <= BATCH_MAX_POSTS:
+        return jsonify({"error": f"count must be between 1 and {BATCH_MAX_POSTS}"}), 400
+
+    job_id = enqueue_job('batch', {
+        "count": count,
+        "concurrency": concurrency,
+        "categories": data.get('categories'),
+        "publish": bool(data.get('publish', False)),
+        "emergency_override": request.headers.get('X-Emergency-Override') == 'true'
+    })
+    if job_id is None:
+        return jsonify({"success": False, "error": "Could not queue batch job - database unavailable"}), 500
+    return jsonify({"success": True, "status": "queued", "job_id": job_id, "status_url": f"/api/jobs/{job_id}",
+                    "events_url": f"/api/jobs/{job_id}/events"}), 202
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@require_auth
+def job_status(job_id):
+    """Status, current stage and per-stage progress of a generation job"""
+    try:
+        job = get_job(job_id)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+def sse_response(job_id):
+    """text/event-stream of stage, token and done events for a job"""
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}  # Keep nginx/proxies from buffering
+    return Response(stream_with_context(job_event_stream(job_id)), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/jobs/<int:job_id>/events', methods=['GET'])
+@require_auth
+def job_events(job_id):
+    """Server-Sent Events: live stage transitions and model tokens until the job finishes"""
+    return sse_response(job_id)
+
 @app.route('/api/bot-status', methods=['GET'])
 def bot_status():
     """Check if GEMINI_API_KEY is configured"""
@@ -442,7 +822,7 @@ def get_subscribers():
         subscribers = cur.fetchall()
         cur.close()
         conn.close()
-        return jsonify({'subscribers': subscribers})
+        return json_response({'subscribers': subscribers})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
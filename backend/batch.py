@@ -0,0 +1,240 @@
+"""
+Batch generation: produce N posts in one run with bounded concurrency
+Topics are drawn without duplicates from PILLARS and data/topics.json, and all results are
+inserted in a single multi-row transaction. Drafts that near-duplicate the archive re-roll onto an
+unused topic; final posts are screened against the archive and against each other. A batch that publishes goes through
+limiter.single_flight like publish_post: it waits for the publish rate limit and never runs
+alongside another generation.
+
+Usage: python batch.py --count 10 [--concurrency 3] [--category Money] [--publish [--emergency-override]]
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from psycopg2.extras import execute_values
+
+from bot import DUPLICATE_MAX_REROLLS, PILLARS, generate_content, make_slug
+from cache import invalidate_posts
+from db import get_db_connection
+from enrich import DERIVED_COLUMNS, derive
+from quality import check as quality_check
+from limiter import single_flight
+from llm import pop_tokens, track_tokens
+from similarity import DUPLICATE_THRESHOLD, DuplicateContent, estimate, find_similar
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+BATCH_MAX_POSTS = int(os.getenv("BATCH_MAX_POSTS", "50"))
+TOPICS_FILE = os.getenv("TOPICS_FILE", os.path.join(os.path.dirname(__file__), "..", "data", "topics.json"))
+
+def load_topic_pool(categories=None):
+    """All (category, topic) pairs from PILLARS plus data/topics.json, de-duplicated"""
+    pool = [(category, topic) for category, topics in PILLARS.items() for topic in topics]
+    try:
+        with open(TOPICS_FILE, encoding="utf-8") as f:
+            extra = json.load(f).get("pillars", {})
+        pool += [(category, topic) for category, spec in extra.items() for topic in spec.get("topics", [])]
+    except (OSError, ValueError) as e:
+        print(f"ℹ️ No extra topics loaded from {TOPICS_FILE}: {e}")
+
+    seen = set()
+    unique = []
+    for category, topic in pool:
+        key = topic.strip().lower()
+        if key in seen or (categories and category not in categories):
+            continue
+        seen.add(key)
+        unique.append((category, topic))
+    return unique
+
+def pick_topics(count, categories=None):
+    """(count topics for the batch, the unused rest in random order for re-rolls)"""
+    pool = load_topic_pool(categories)
+    if count > len(pool):
+        print(f"⚠️ Only {len(pool)} distinct topics available, generating {len(pool)} posts")
+    random.shuffle(pool)
+    return pool[:count], pool[count:]
+
+def _generate_one(item, run_id, spare):
+    """Post dict for one batch item ({"category", "topic"}), or None.
+
+    spare is a queue of unused (category, topic) for re-rolls; a re-roll updates item in place and
+    keeps the first topic as item["rerolled_from"], so the batch report names what was really tried.
+    """
+    category, topic = item["category"], item["topic"]
+    for _ in range(DUPLICATE_MAX_REROLLS + 1):
+        try:
+            title, content, meta_desc, keywords, hashtags, search_queries, excerpt = generate_content(
+                topic, category, run_id
+            )
+            break
+        except DuplicateContent as e:
+            print(f"🔁 Draft for '{topic}' is a near-duplicate of '{e.match['title']}' ({e.match['similarity']:.0%})")
+            try:
+                category, topic = spare.get_nowait()
+            except queue.Empty:
+                return None
+            item.setdefault("rerolled_from", item["topic"])
+            item.update(category=category, topic=topic)
+    else:
+        return None
+    if not title:
+        return None
+
+    excerpt = excerpt or f"Insights on {topic}"
+    content, derived = derive(content, excerpt)
+    problems = quality_check(title, content, word_count=derived["word_count"])
+    if problems:
+        print(f"❌ Quality gate failed for '{title}': {'; '.join(problems)}")
+        return None
+    # The editor and humanizer rewrite the draft, so check the final text against the archive too
+    matches = find_similar(derived["minhash"], derived["lsh_bands"], limit=1)
+    if matches:
+        print(f"❌ '{title}' is a near-duplicate of '{matches[0]['title']}' ({matches[0]['similarity']:.0%})")
+        return None
+    return {
+        "slug": make_slug(title),
+        "title": title,
+        "excerpt": excerpt,
+        "content": content,
+        "derived": derived,
+        "tags": category,
+        "meta_description": meta_desc,
+        "keywords": json.dumps(keywords),
+        "hashtags": json.dumps(hashtags),
+        "search_queries": json.dumps(search_queries),
+    }
+
+def insert_posts(posts, publish=False):
+    """Insert all generated posts (already derived) in one transaction; returns [(id, slug)] (existing slugs are skipped)"""
+    if not posts:
+        return []
+    values = [
+        (p["slug"], p["title"], p["excerpt"], p["content"], publish, 'WaveSignals', p["tags"],
+         p["meta_description"], p["keywords"], p["hashtags"], p["search_queries"],
+         *(p["derived"][c] for c in DERIVED_COLUMNS))
+        for p in posts
+    ]
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        rows = execute_values(cur, """
+            INSERT INTO posts (
+                slug, title, excerpt, content, published, author, tags,
+                meta_description, keywords, hashtags, search_queries,
+                word_count, reading_minutes, toc, plain_excerpt, content_hash, minhash, lsh_bands
+            )
+            VALUES %s
+            ON CONFLICT (slug) DO NOTHING
+            RETURNING id, slug
+        """, values, fetch=True)
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    invalidate_posts()
+    return [(row['id'], row['slug']) for row in rows]
+
+def generate_batch(count, concurrency=BATCH_CONCURRENCY, categories=None, publish=False, emergency_override=False):
+    """Generate `count` posts with at most `concurrency` pipelines in flight.
+
+    Per-provider requests-per-minute budgets are enforced inside llm.py. Posts are stored
+    as drafts unless publish=True, which takes the publish_post rate limit (see limiter.py;
+    emergency_override bypasses it). Returns a summary with throughput figures.
+    """
+    if publish:
+        return single_flight(
+            "publish_post", lambda: _run_batch(count, concurrency, categories, True), bypass_limit=emergency_override
+        )
+    return _run_batch(count, concurrency, categories, False)
+
+def _batch_twin(post, accepted):
+    """First post already accepted in this batch that post near-duplicates (the archive check can't see them)"""
+    sig = post["derived"]["minhash"]
+    if sig is None:
+        return None
+    return next((other for other in accepted if other["derived"]["minhash"] is not None
+                 and estimate(sig, other["derived"]["minhash"]) >= DUPLICATE_THRESHOLD), None)
+
+def _run_batch(count, concurrency, categories, publish):
+    count = min(count, BATCH_MAX_POSTS)
+    topics, rest = pick_topics(count, categories)
+    spare = queue.Queue()
+    for item in rest:
+        spare.put(item)
+    started = time.monotonic()
+    print(f"📦 Batch: generating {len(topics)} posts, concurrency {concurrency}")
+
+    generated, failed = [], []
+    tokens = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as executor:
+        futures = {}
+        for category, topic in topics:
+            run_id = uuid.uuid4().hex
+            track_tokens(run_id)  # Counted per run: llm's provider stats are shared with other jobs
+            item = {"category": category, "topic": topic}
+            futures[executor.submit(_generate_one, item, run_id, spare)] = (item, run_id)
+        # as_completed hands results to this thread one at a time, so `generated` needs no lock
+        for future in as_completed(futures):
+            item, run_id = futures[future]
+            tokens += pop_tokens(run_id)
+            try:
+                post = future.result()
+            except Exception as e:
+                print(f"❌ Batch item failed ({item['topic']}): {e}")
+                post = None
+            twin = post and _batch_twin(post, generated)
+            if twin:
+                print(f"❌ '{post['title']}' is a near-duplicate of '{twin['title']}' from this batch")
+                post = None
+            if post:
+                generated.append(post)
+            else:
+                failed.append(item)
+
+    # Same title twice in one batch would collide on slug; keep the first
+    unique = list({p["slug"]: p for p in reversed(generated)}.values())
+    inserted = insert_posts(unique, publish=publish)
+
+    elapsed = time.monotonic() - started
+    minutes = max(elapsed / 60.0, 1e-9)
+    summary = {
+        "success": bool(inserted),
+        "requested": count,
+        "generated": len(generated),
+        "inserted": [{"id": post_id, "slug": slug} for post_id, slug in inserted],
+        "skipped_duplicates": len(generated) - len(inserted),
+        "failed": failed,
+        "published": publish,
+        "elapsed_seconds": round(elapsed, 1),
+        "posts_per_minute": round(len(generated) / minutes, 2),
+        "tokens": tokens,
+        "tokens_per_minute": round(tokens / minutes, 1),
+    }
+    if not inserted:
+        summary["error"] = "Batch produced no new posts"
+    print(f"✅ Batch done: {len(inserted)} inserted, {len(failed)} failed in {elapsed:.0f}s "
+          f"({summary['posts_per_minute']} posts/min, {summary['tokens_per_minute']} tokens/min)")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate several posts in one run")
+    parser.add_argument("--count", type=int, required=True)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--category", action="append", help="Restrict to a category (repeatable)")
+    parser.add_argument("--publish", action="store_true", help="Publish immediately instead of saving drafts")
+    parser.add_argument("--emergency-override", action="store_true", help="With --publish, bypass the publish rate limit")
+    args = parser.parse_args()
+    print(json.dumps(generate_batch(args.count, args.concurrency, args.category, args.publish, args.emergency_override),
+                     indent=2, default=str))
@@ -0,0 +1,96 @@
+"""
+Success rate and latency of LLM JSON extraction
+Replays llm_json_corpus.jsonl (recorded bad outputs from each pipeline pass) through the old
+strip-fences-and-json.loads approach and through llm_json.extract_json, checking each result
+against the pass's schema (and, for the editor pass, require_complete as bot.py does). Cases marked
+expect_error count as a success when extraction fails.
+
+Run: python bench_llm_json.py [--cache] [--repeat 200]
+  --cache also replays every response in LLM_CACHE_DIR (no expectations: success = a JSON object)
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+from bot import EDITOR_SCHEMA, HUMANIZER_SCHEMA, KEYWORD_SCHEMA, TRENDS_SCHEMA
+from llm import LLM_CACHE_DIR
+from llm_json import JSONExtractError, extract_json, validate
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_json_corpus.jsonl")
+SCHEMAS = {"trends": TRENDS_SCHEMA, "keywords": KEYWORD_SCHEMA, "editor": EDITOR_SCHEMA, "humanizer": HUMANIZER_SCHEMA}
+COMPLETE_PASSES = {"editor"}  # Passes that call extract_json(..., require_complete=True)
+
+def legacy_extract(text, schema=None, require_complete=False):
+    """The slicing bot._editor_pass used before llm_json (other passes only stripped fences)"""
+    clean = text.strip()
+    first_brace = clean.find('{')
+    if first_brace > 0:
+        clean = clean[first_brace:]
+    clean = clean.replace('```json', '').replace('```', '')
+    last_brace = clean.rfind('}')
+    if 0 < last_brace < len(clean) - 1:
+        after_text = clean[last_brace + 1:].strip()
+        if any(word in after_text.lower() for word in ['made', 'changes', 'improved', 'following', 'optimized']):
+            clean = clean[:last_brace + 1]
+    data = json.loads(clean.strip())
+    return validate(data, schema) if schema else data
+
+def load_corpus(include_cache=False):
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    if include_cache:
+        for path in sorted(glob.glob(os.path.join(LLM_CACHE_DIR, "*", "*.json"))):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = json.load(f).get("text")
+            except (OSError, ValueError, AttributeError):
+                continue
+            if text and "{" in text:
+                cases.append({"name": os.path.basename(path), "pass": None, "text": text})
+    return cases
+
+def run(extract, case, repeat):
+    schema = SCHEMAS.get(case["pass"])
+    complete = case["pass"] in COMPLETE_PASSES
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            data = extract(case["text"], schema, complete)
+            ok = isinstance(data, dict) and not case.get("expect_error")
+        except ValueError:  # JSONDecodeError and JSONExtractError
+            ok = bool(case.get("expect_error"))
+        timings.append(time.perf_counter() - started)
+    return ok, timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM JSON extraction")
+    parser.add_argument("--cache", action="store_true", help=f"Also replay responses in {LLM_CACHE_DIR}")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per case")
+    args = parser.parse_args()
+
+    cases = load_corpus(args.cache)
+    extractors = {"legacy": legacy_extract, "extract_json": extract_json}
+    results = {name: {"ok": 0, "timings": [], "misses": []} for name in extractors}
+    for case in cases:
+        for name, extract in extractors.items():
+            ok, timings = run(extract, case, args.repeat)
+            results[name]["ok"] += ok
+            results[name]["timings"].extend(timings)
+            if not ok:
+                results[name]["misses"].append(case["name"])
+
+    print(f"📊 {len(cases)} responses, {args.repeat} runs each")
+    for name, r in results.items():
+        timings = sorted(r["timings"])
+        p95 = timings[int(len(timings) * 0.95)]
+        print(f"  {name:<13} {r['ok']}/{len(cases)} ok ({r['ok'] / len(cases):.0%})  "
+              f"mean {statistics.mean(timings) * 1e6:.1f}µs  p95 {p95 * 1e6:.1f}µs")
+        for miss in r["misses"]:
+            print(f"    ❌ {miss}")
+
+if __name__ == "__main__":
+    main()
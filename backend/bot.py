@@ -1,12 +1,21 @@
 import os
+import re
 import time
-import requests
 import json
 import random
+import threading
+import uuid
 from db import get_db_connection
-from dotenv import load_dotenv
+from cache import invalidate_posts
+from enrich import DERIVED_COLUMNS, derive
+from quality import check as quality_check, scan_phrases
+from similarity import DuplicateContent, ensure_novel, find_similar
+from llm_json import REQUIRED, JSONExtractError, extract_json
+from llm import call_llm, forget_response, LLM_CACHE_DIR
+from limiter import exclusive, single_flight
+from pipeline import PipelineAbort, run_pipeline, format_timings, notify_stage
 
-load_dotenv()
+# .env is loaded by db.py, imported above
 
 # Configure Gemini
 API_KEY = os.getenv("GEMINI_API_KEY")
@@ -51,52 +60,19 @@ PILLARS = {
     ]
 }
 
-# Groq API (FREE alternative - faster than Gemini!)
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# LLM calls go through llm.py: Groq first, then any other configured provider as a hedge
+def call_groq(prompt, run_id=None, on_token=None):
+    """Call Groq (with hedged fallback to OpenAI/Gemini when configured).
 
-def call_groq(prompt):
-    """Call Groq API - Free and fast alternative to Gemini/OpenAI"""
-    if not GROQ_API_KEY:
-        print("⚠️ GROQ_API_KEY not configured")
-        return None
-    
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "llama-3.3-70b-versatile",  # Fast and good quality
-        "messages": [
-            {"role": "system", "content": "You are a thoughtful content writer creating engaging blog posts."},
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 4000,
-        "temperature": 0.8
-    }
-    
-    try:
-        print(f"🔄 Calling Groq API...")
-        response = requests.post(url, json=payload, headers=headers, timeout=90)
-        
-        if response.status_code != 200:
-            print(f"❌ Groq API Error: HTTP {response.status_code}")
-            print(f"   Response: {response.text[:300]}")
-            return None
-        
-        response_data = response.json()
-        
-        if 'choices' not in response_data or len(response_data['choices']) == 0:
-            print(f"❌ Unexpected Groq response format")
-            return None
-        
-        content = response_data['choices'][0]['message']['content']
-        print(f"✅ Groq responded ({len(content)} chars)")
-        return content
-        
-    except Exception as e:
-        print(f"❌ Groq API Error: {e}")
-        return None
+    Passing a generation run_id makes the call replayable from the LLM response cache;
+    on_token(text, provider) receives streamed output.
+    """
+    return call_llm(prompt, cache_namespace=run_id, on_token=on_token)
+
+def reject_groq(prompt, run_id=None):
+    """Forget a cached call_groq reply that its pass rejected, so a resumed run regenerates it"""
+    if run_id:
+        forget_response(prompt, cache_namespace=run_id)
 
 # API_KEY = os.getenv("GEMINI_API_KEY") # No longer needed
 # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # No longer needed
@@ -199,20 +175,40 @@ def call_groq(prompt):
 #     print("❌ All AI providers failed!")
 #     return None
 
-def research_trending_topics():
-    """Research what people are actually searching for on social platforms"""
-    
-    research_prompt = """
-    Role: Internet trend researcher analyzing current discussions.
-    Task: Research what topics are trending RIGHT NOW across social platforms.
+# --- LLM OUTPUT SCHEMAS (llm_json.validate: field -> (type, default or REQUIRED)) ---
+TRENDS_SCHEMA = {"trendingTopics": (list, []), "hotKeywords": (list, []), "risingQuestions": (list, [])}
+KEYWORD_SCHEMA = {
+    "primaryKeywords": (list, []), "longTailKeywords": (list, []), "trendingTerms": (list, []),
+    "hashtags": (list, []), "searchQueries": (list, []),
+}
+EDITOR_SCHEMA = {
+    "title": (str, REQUIRED), "content": (str, REQUIRED), "metaDescription": (str, ""),
+    "keywords": (list, []), "hashtags": (list, []), "searchQueries": (list, []), "excerpt": (str, ""),
+}
+HUMANIZER_SCHEMA = {"content": (str, REQUIRED)}
+
+def research_trending_topics(category=None):
+    """Research what people are actually searching for on social platforms (blocking LLM call)"""
     
+    if category:
+        categories = f"""
+    Category to analyze:
+    - {category}
+    """
+    else:
+        categories = """
     Categories to analyze:
     - Career & Professional Development
     - Personal Finance & Money
     - Technology & AI
     - Health & Fitness  
     - Content Creation & Social Media
-    
+    """
+
+    research_prompt = """
+    Role: Internet trend researcher analyzing current discussions.
+    Task: Research what topics are trending RIGHT NOW across social platforms.
+    """ + categories + """
     Your research sources (simulate searching):
     1. Reddit: What's trending on r/careeradvice, r/personalfinance, r/technology
     2. Twitter/X: Current trending hashtags and discussions
@@ -237,17 +233,139 @@ def research_trending_topics():
     
     if research_data:
         try:
-            clean = research_data.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean)
-        except:
-            pass
+            return extract_json(research_data, TRENDS_SCHEMA)
+        except JSONExtractError as e:
+            print(f"⚠️ Trend research returned no usable JSON: {e}")
     
     return {"trendingTopics": [], "hotKeywords": [], "risingQuestions": []}
 
-def generate_content(topic, category):
-    # Research trends first
+# --- TREND RESEARCH CACHE ---
+# Trends don't change minute to minute: research is stored per (category, time bucket) in
+# the trend_research table and refreshed in the background, so generation never waits on it.
+TRENDS_TTL_HOURS = float(os.getenv("TRENDS_TTL_HOURS", "6"))
+_trends_memory = {}  # category -> (bucket, data)
+_trends_refreshing = set()
+_trends_lock = threading.Lock()
+
+def _trends_bucket():
+    return int(time.time() // (TRENDS_TTL_HOURS * 3600))
+
+def _load_stored_trends(category):
+    """Newest stored research for a category as (bucket, data), or None"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT bucket, data FROM trend_research
+            WHERE category = %s
+            ORDER BY bucket DESC
+            LIMIT 1
+        """, (category,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return (row['bucket'], row['data']) if row else None
+    except Exception as e:
+        print(f"⚠️ Could not load cached trends: {e}")
+        conn.close()
+        return None
+
+def refresh_trends(category):
+    """Research trends for a category now and store them for the current bucket"""
+    bucket = _trends_bucket()
+    trends = research_trending_topics(category)
+    if not trends.get("trendingTopics"):
+        return trends  # Don't cache failures; the next caller will retry
+
+    with _trends_lock:
+        _trends_memory[category] = (bucket, trends)
+
+    conn = get_db_connection()
+    if not conn:
+        return trends
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO trend_research (category, bucket, data)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (category, bucket) DO UPDATE SET data = EXCLUDED.data, created_at = NOW()
+        """, (category, bucket, json.dumps(trends)))
+        cur.execute("DELETE FROM trend_research WHERE category = %s AND bucket < %s", (category, bucket - 4))
+        conn.commit()
+        cur.close()
+        conn.close()
+        print(f"✅ Trend research cached for {category}")
+    except Exception as e:
+        print(f"⚠️ Could not store trend research: {e}")
+        conn.close()
+    return trends
+
+def refresh_trends_async(category):
+    """Kick off a background refresh unless one is already running for this category"""
+    with _trends_lock:
+        if category in _trends_refreshing:
+            return
+        _trends_refreshing.add(category)
+
+    def run():
+        try:
+            refresh_trends(category)
+        finally:
+            with _trends_lock:
+                _trends_refreshing.discard(category)
+
+    threading.Thread(target=run, name=f"trends-{category}", daemon=True).start()
+
+def get_cached_trends(category):
+    """Trend research for a category without blocking on the LLM.
+
+    Returns the current bucket's research if any process stored it, otherwise the newest
+    stale copy (or empty trends) while a background refresh runs.
+    """
+    bucket = _trends_bucket()
+    with _trends_lock:
+        cached = _trends_memory.get(category)
+
+    if not cached or cached[0] != bucket:
+        stored = _load_stored_trends(category)
+        if stored and (not cached or stored[0] >= cached[0]):
+            cached = stored
+            with _trends_lock:
+                _trends_memory[category] = stored
+
+    if cached and cached[0] == bucket:
+        return cached[1]
+
+    refresh_trends_async(category)
+    if cached:
+        print(f"♻️ Using trend research from a previous window for {category} (refreshing)")
+        return cached[1]
+    return {"trendingTopics": [], "hotKeywords": [], "risingQuestions": []}
+
+def warm_trend_cache():
+    """Research every pillar whose stored trends are stale (scheduled job, also run at boot).
+
+    Runs under a lease, so of all gunicorn workers and replicas only one pays for the research;
+    the others find it in trend_research when they next need it.
+    """
+    return exclusive("warm_trends", _refresh_stale_trends)
+
+def _refresh_stale_trends():
+    bucket = _trends_bucket()
+    for category in PILLARS:
+        stored = _load_stored_trends(category)
+        if stored and stored[0] == bucket:
+            with _trends_lock:
+                _trends_memory[category] = stored
+            continue
+        refresh_trends(category)  # Synchronously: the lease must cover the research itself
+
+def _research_pass(category):
+    """Trend research -> short context block for the draft prompt"""
     print(f"🔍 Researching internet trends for {category}...")
-    trends = research_trending_topics()
+    trends = get_cached_trends(category)
     
     trending_context = ""
     if trends.get("trendingTopics"):
@@ -255,7 +373,9 @@ def generate_content(topic, category):
         trending_context = "\n\nCurrent trending discussions:\n"
         for t in trending_topics:
             trending_context += f"- {t['topic']} (trending on {t['platform']})\n"
-    
+    return trending_context
+
+def _draft_pass(topic, category, trending_context, run_id=None, on_token=None):
     print(f"🧠 Generating Insight for: '{topic}' ({category})...")
     
     # PASS 1: THE PHILOSOPHER (Insight Focused)
@@ -278,9 +398,12 @@ def generate_content(topic, category):
     Format: HTML only (use <h2>, <p>, <strong>, <em> tags). No markdown.
     """
     
-    draft = call_groq(draft_prompt)
-    if not draft: return None, None, None, None, None, None, None
+    draft = call_groq(draft_prompt, run_id, on_token)
+    if not draft:
+        raise PipelineAbort("Draft pass returned nothing")
+    return draft
 
+def _keyword_pass(topic, category, draft, run_id=None, on_token=None):
     print(f"🔍 Researching Keywords & Tags for '{topic}'...")
     
     # PASS 1.5: KEYWORD RESEARCHER (Dynamic SEO)
@@ -311,17 +434,17 @@ def generate_content(topic, category):
     Be strategic. These keywords determine if people find this post.
     """
     
-    keywords_json = call_groq(keyword_prompt)
+    keywords_json = call_groq(keyword_prompt, run_id, on_token)
     
     # Parse keywords or use defaults
-    keyword_data = {"primaryKeywords": [], "longTailKeywords": [], "trendingTerms": [], "hashtags": [], "searchQueries": []}
-    if keywords_json:
-        try:
-            clean_kw = keywords_json.replace("```json", "").replace("```", "").strip()
-            keyword_data = json.loads(clean_kw)
-        except:
-            pass
+    try:
+        return extract_json(keywords_json, KEYWORD_SCHEMA)
+    except JSONExtractError as e:
+        print(f"⚠️ Keyword pass returned no usable JSON, using defaults: {e}")
+        reject_groq(keyword_prompt, run_id)
+        return {field: [] for field in KEYWORD_SCHEMA}
 
+def _editor_pass(topic, draft, run_id=None, on_token=None):
     print(f"✒️ Polishing & Formatting '{topic}'...")
 
     # PASS 2: THE EDITOR (Structure & Monetization Guard + SEO)
@@ -344,65 +467,32 @@ def generate_content(topic, category):
     }}
     """
     
-    final_json_text = call_groq(editor_prompt)
-    if not final_json_text: return None, None, None, None, None, None, None
-
-    import re
-    
-    # STEP 1: Strip ALL wrapper text before JSON
-    clean_text = final_json_text.strip()
-    
-    # Remove ANY text before the first {
-    first_brace = clean_text.find('{')
-    if first_brace > 0:
-        clean_text = clean_text[first_brace:]
-    
-    # Remove markdown fences
-    clean_text = clean_text.replace('```json', '').replace('```', '')
-    
-    # Remove anything after closing } that isn't part of JSON
-    # Find the last } and check if there's explanatory text after
-    last_brace = clean_text.rfind('}')
-    if last_brace > 0 and last_brace < len(clean_text) - 1:
-        # Check if text after } is explana tory (contains words like "made", "changes", "improved")
-        after_text = clean_text[last_brace+1:].strip()
-        if any(word in after_text.lower() for word in ['made', 'changes', 'improved', 'following', 'optimized']):
-            clean_text = clean_text[:last_brace+1]
-    
-    clean_text = clean_text.strip()
+    final_json_text = call_groq(editor_prompt, run_id, on_token)
+    if not final_json_text:
+        raise PipelineAbort("Editor pass returned nothing")
 
+    # STEP 1: Extract the JSON object, ignoring fences and chatter around it (see llm_json.py)
     try:
-        data = json.loads(clean_text)
+        data = extract_json(final_json_text, EDITOR_SCHEMA, require_complete=True)  # Never publish a cut-off post
         
-        # STEP 2: Extract fields from JSON
-        title = data.get("title", "")
-        raw_content = data.get("content", "")
+        # STEP 2: Extract fields from JSON (EDITOR_SCHEMA guarantees non-empty strings)
+        title = data["title"]
+        raw_content = data["content"].strip()
         
         # STEP 3: CRITICAL - Content should be pure HTML, nothing else
-        if not isinstance(raw_content, str):
-            print("❌ ERROR: Content is not a string")
-            return None, None, None, None, None, None, None
-        
-        raw_content = raw_content.strip()
         
-        # REJECT if content contains ANY of these artifacts
-        reject_patterns = [
-            'Here is', 'Here\'s', 'I made', 'following changes',
-            '```json', '```', '"title":', '"metaDescription":',
-            'optimized for SEO', 'Removed aggressive', 'Added formatting'
-        ]
-        
-        for pattern in reject_patterns:
-            if pattern in raw_content:
-                print(f"❌ ERROR: Content contains artifact: '{pattern}'")
-                print(f"Content preview: {raw_content[:200]}")
-                return None, None, None, None, None, None, None
+        # REJECT if content contains ANY editor artifacts (quality.ARTIFACT_PATTERNS, one scan)
+        artifacts = scan_phrases(raw_content)["artifact"]
+        if artifacts:
+            print(f"❌ ERROR: Content contains artifact: '{artifacts[0]}'")
+            print(f"Content preview: {raw_content[:200]}")
+            raise PipelineAbort(f"Content contains artifact: '{artifacts[0]}'")
         
         # Content MUST start with HTML tag
         if not raw_content.startswith('<'):
             print(f"❌ ERROR: Content doesn't start with HTML tag")
             print(f"Starts with: {raw_content[:50]}")
-            return None, None, None, None, None, None, None
+            raise PipelineAbort("Content doesn't start with HTML tag")
         
         # Content MUST end with HTML tag
         if not raw_content.endswith('>'):
@@ -421,14 +511,22 @@ def generate_content(topic, category):
         content = raw_content
         print(f"✅ Clean content extracted: {len(content)} chars, starts with: {content[:30]}")
         
-    except json.JSONDecodeError as e:
+    except JSONExtractError as e:
         print(f"❌ JSON parse error: {e}")
-        print(f"Attempted to parse: {clean_text[:200]}")
-        return None, None, None, None, None, None, None
+        print(f"Attempted to parse: {final_json_text[:200]}")
+        reject_groq(editor_prompt, run_id)
+        raise PipelineAbort(f"JSON parse error: {e}")
+    except PipelineAbort:
+        reject_groq(editor_prompt, run_id)
+        raise
     except Exception as e:
         print(f"❌ Unexpected error: {e}")
-        return None, None, None, None, None, None, None
+        reject_groq(editor_prompt, run_id)
+        raise PipelineAbort(f"Unexpected error: {e}")
     
+    return data, title, content
+
+def _humanizer_pass(title, content, run_id=None, on_token=None):
     print(f"🎭 Humanizing & Paraphrasing '{title}'...")
     
     # PASS 3: THE HUMANIZER (Anti-AI Detection)
@@ -468,7 +566,7 @@ def generate_content(topic, category):
     Make it sound like a smart human wrote it naturally.
     """
     
-    humanized_content = call_groq(humanize_prompt)
+    humanized_content = call_groq(humanize_prompt, run_id, on_token)
     
     # Use humanized version if successful and clean
     if humanized_content and len(humanized_content) > 200:
@@ -481,9 +579,8 @@ def generate_content(topic, category):
         # Remove JSON wrappers if present
         if humanized_content.startswith('{') and '"content"' in humanized_content:
             try:
-                temp_json = json.loads(humanized_content)
-                humanized_content = temp_json.get("content", humanized_content)
-            except:
+                humanized_content = extract_json(humanized_content, HUMANIZER_SCHEMA)["content"]
+            except JSONExtractError:
                 pass
         
         # Remove any "Note:" sections
@@ -491,7 +588,6 @@ def generate_content(topic, category):
             humanized_content = humanized_content.split("Note:")[0].strip()
         
         # Final sanitization - remove any code artifacts
-        import re
         humanized_content = humanized_content.rstrip()
         humanized_content = re.sub(r'[}"\'\s;]+$', '', humanized_content)
         humanized_content = re.sub(r'^[{"\s]+', '', humanized_content)
@@ -508,6 +604,45 @@ def generate_content(topic, category):
         
         content = humanized_content.strip()
     
+    return content
+
+def generate_content(topic, category, run_id=None, on_stage=None, on_token=None):
+    """Run the LLM passes as a dependency graph and return the 7-tuple for publish_post.
+
+    research -> draft -> novelty -> (keywords || editor -> humanizer)
+    The keyword pass only needs draft[:500], so it overlaps the editor and humanizer passes.
+    novelty raises similarity.DuplicateContent when the draft is a near-duplicate of an archived post.
+    With a run_id every pass is cached, so re-running the same run resumes where it failed.
+    on_stage(name, status, seconds) receives per-stage progress (see pipeline.run_pipeline) and
+    on_token(stage, text, provider) the streamed LLM output of each pass.
+    """
+    def tokens(stage):
+        if on_token is None:
+            return None
+        return lambda text, provider=None: on_token(stage, text, provider)
+
+    stages = {
+        "research": ((), lambda r: _research_pass(category)),
+        "draft": (("research",), lambda r: _draft_pass(topic, category, r["research"], run_id, tokens("draft"))),
+        # Near-duplicate screen on the draft, before the three remaining LLM passes are paid for
+        "novelty": (("draft",), lambda r: ensure_novel(r["draft"])),
+        "keywords": (("novelty",), lambda r: _keyword_pass(topic, category, r["draft"], run_id, tokens("keywords"))),
+        "editor": (("novelty",), lambda r: _editor_pass(topic, r["draft"], run_id, tokens("editor"))),
+        "humanizer": (("editor",), lambda r: _humanizer_pass(r["editor"][1], r["editor"][2], run_id, tokens("humanizer"))),
+    }
+
+    started = time.monotonic()
+    try:
+        results, timings = run_pipeline(stages, on_stage=on_stage)
+    except PipelineAbort as e:
+        print(f"❌ Generation aborted: {e}")
+        return None, None, None, None, None, None, None
+    print(format_timings(timings, time.monotonic() - started))
+
+    keyword_data = results["keywords"]
+    data, title, _ = results["editor"]
+    content = results["humanizer"]
+
     # Combine keywords from both passes
     all_keywords = list(set(keyword_data.get("primaryKeywords", []) + keyword_data.get("longTailKeywords", []) + keyword_data.get("trendingTerms", []) + data.get("keywords", [])))
     
@@ -524,113 +659,153 @@ def generate_content(topic, category):
         data.get("excerpt", "")
     )
 
-def publish_post(emergency_override=False):
-    # RATE LIMITING: Check if last post was within 23 hours (unless emergency override)
-    if not emergency_override:
-        conn = get_db_connection()
-        if not conn:
-            print("❌ Database connection failed")
-            return {"success": False, "error": "Database connection failed"}
+def make_slug(title):
+    return title.lower().replace(" ", "-").replace(":", "").replace("?", "").replace("(", "").replace(")", "").replace("'", "")
+
+# --- RESUMABLE RUNS ---
+# A failed generation leaves its (topic, run_id) behind; the next publish_post resumes it so the
+# passes that already succeeded are replayed from the LLM response cache instead of re-billed.
+PENDING_RUN_PATH = os.path.join(LLM_CACHE_DIR, "pending_run.json")
+MAX_RUN_ATTEMPTS = 3
 
+def _load_pending_run():
+    try:
+        with open(PENDING_RUN_PATH, encoding="utf-8") as f:
+            run = json.load(f)
+        if run.get("category") in PILLARS and run.get("attempts", 0) < MAX_RUN_ATTEMPTS:
+            return run
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _save_pending_run(run):
+    try:
+        os.makedirs(os.path.dirname(PENDING_RUN_PATH), exist_ok=True)
+        tmp = PENDING_RUN_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(run, f)
+        os.replace(tmp, PENDING_RUN_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not save pending run: {e}")
+
+def _clear_pending_run():
+    try:
+        os.remove(PENDING_RUN_PATH)
+    except OSError:
+        pass
+
+# --- TOPIC SELECTION ---
+DUPLICATE_MAX_REROLLS = int(os.getenv("DUPLICATE_MAX_REROLLS", "2"))  # Fresh topics tried after a near-duplicate draft
+
+def _new_run(exclude=()):
+    """LEVEL 4: Randomized Behavior - a random Category, then a random Topic not in exclude"""
+    category = random.choice(list(PILLARS.keys()))
+    topics = [t for t in PILLARS[category] if t not in exclude] or PILLARS[category]
+    return {"run_id": uuid.uuid4().hex, "category": category, "topic": random.choice(topics), "attempts": 0}
+
+def publish_post(emergency_override=False, on_stage=None, on_token=None):
+    """Generate and publish one post.
+
+    Rate limiting (one post per PUBLISH_INTERVAL_HOURS unless emergency_override) and the
+    one-generation-at-a-time guarantee across processes and replicas live in limiter.py.
+    """
+    return single_flight(
+        "publish_post", lambda: _generate_and_insert(on_stage, on_token), bypass_limit=emergency_override
+    )
+
+def _generate_and_insert(on_stage=None, on_token=None):
+    run = _load_pending_run()
+    if run:
+        print(f"♻️ Resuming failed run {run['run_id'][:8]} for '{run['topic']}' (attempt {run['attempts'] + 1})")
+    else:
+        run = _new_run()
+
+    # Get SEO-optimized content; a draft that duplicates an archived post re-rolls the topic
+    tried = set()
+    while True:
+        category, topic = run["category"], run["topic"]
+        run["attempts"] += 1
+        _save_pending_run(run)
         try:
-            cur = conn.cursor()
-            
-            # Check last post timestamp
-            cur.execute("""
-                SELECT created_at FROM posts 
-                ORDER BY created_at DESC 
-                LIMIT 1
-            """)
-            last_post = cur.fetchone()
-            
-            if last_post:
-                from datetime import datetime, timezone
-                last_post_time = last_post['created_at']
-                
-                # Handle both timezone-aware and naive datetimes
-                if last_post_time.tzinfo is None:
-                    last_post_time = last_post_time.replace(tzinfo=timezone.utc)
-                
-                now = datetime.now(timezone.utc)
-                hours_since = (now - last_post_time).total_seconds() / 3600
-                
-                if hours_since < 23:
-                    remaining = 23 - hours_since
-                    print(f"⏳ Rate limit: Last post was {hours_since:.1f}h ago. Wait {remaining:.1f}h more.")
-                    cur.close()
-                    conn.close()
-                    return {
-                        "success": False, 
-                        "error": f"Rate limit: Must wait {remaining:.1f} hours before next post",
-                        "hours_remaining": remaining
-                    }
-            
-            print("✅ Rate limit passed, proceeding with generation...")
-            cur.close()
-            
+            title, content, meta_desc, keywords, hashtags, search_queries, excerpt = generate_content(topic, category, run["run_id"], on_stage, on_token)
+            break
+        except DuplicateContent as e:
+            tried.add(topic)
+            print(f"🔁 Draft for '{topic}' is a near-duplicate of '{e.match['title']}' ({e.match['similarity']:.0%})")
+            if len(tried) > DUPLICATE_MAX_REROLLS:
+                _clear_pending_run()
+                return {"success": False, "error": f"Every topic tried duplicates an existing post: {e}"}
+            run = _new_run(exclude=tried)
         except Exception as e:
-            print(f"⚠️ Rate limit check error: {e}")
-            # Continue anyway if rate limit check fails
-    else:
-        print("🚨 EMERGENCY OVERRIDE: Bypassing rate limit check")
-        conn = get_db_connection()
-        if not conn:
-            print("❌ Database connection failed")
-            return {"success": False, "error": "Database connection failed"}
-    
-    # LEVEL 4: Randomized Behavior
-    # Select a random Category, then a random Topic from that category
-    category = random.choice(list(PILLARS.keys()))
-    topic = random.choice(PILLARS[category])
-    
-    # Get SEO-optimized content
-    try:
-        title, content, meta_desc, keywords, hashtags, search_queries, excerpt = generate_content(topic, category)
-    except Exception as e:
-        conn.close()
-        return {"success": False, "error": f"Content Generation Error: {str(e)}"}
+            return {"success": False, "error": f"Content Generation Error: {str(e)}"}
 
     if not title:
         print("❌ Generation failed.")
-        conn.close()
         return {"success": False, "error": "Generation produced no title/content"}
 
-    slug = title.lower().replace(" ", "-").replace(":", "").replace("?", "").replace("(", "").replace(")", "").replace("'", "")
-    
-    # Reuse existing connection
+    slug = make_slug(title)
+
+    # Publish-time enrichment: word count, reading time, TOC, plain excerpt, content hash
+    notify_stage(on_stage, "enrich", "started")
+    content, derived = derive(content, excerpt)
+    notify_stage(on_stage, "enrich", "finished")
+    excerpt = excerpt or f"Insights on {topic}"
+
+    # Quality gate before the DB write (replaces the separate scripts/quality-gate.js run)
+    notify_stage(on_stage, "quality", "started")
+    problems = quality_check(title, content, word_count=derived["word_count"])
+    if problems:
+        notify_stage(on_stage, "quality", "failed")
+        print(f"❌ Quality gate failed for '{title}': {'; '.join(problems)}")
+        _clear_pending_run()  # A resumed run would replay the same cached passes and fail again
+        return {"success": False, "error": f"Quality gate failed: {'; '.join(problems)}"}
+    notify_stage(on_stage, "quality", "finished")
+
+    # The editor and humanizer rewrite the draft, so check the final text against the archive too
+    matches = find_similar(derived["minhash"], derived["lsh_bands"], limit=1)
+    if matches:
+        print(f"❌ '{title}' is a near-duplicate of '{matches[0]['title']}' ({matches[0]['similarity']:.0%})")
+        _clear_pending_run()
+        return {"success": False, "error": f"Near-duplicate of existing post '{matches[0]['title']}'"}
+
+    conn = get_db_connection()
     if not conn:
-        conn = get_db_connection()
-        if not conn:
-            print("❌ Database connection failed")
-            return {"success": False, "error": "Database connection failed"}
+        print("❌ Database connection failed")
+        return {"success": False, "error": "Database connection failed"}
 
     try:
+        notify_stage(on_stage, "insert", "started")
         cur = conn.cursor()
         
         # Insert post with SEO metadata
         cur.execute("""
             INSERT INTO posts (
                 slug, title, excerpt, content, published, author, tags,
-                meta_description, keywords, hashtags, search_queries
+                meta_description, keywords, hashtags, search_queries,
+                word_count, reading_minutes, toc, plain_excerpt, content_hash, minhash, lsh_bands
             )
-            VALUES (%s, %s, %s, %s, TRUE, 'WaveSignals', %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, TRUE, 'WaveSignals', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id;
         """, (
             slug, 
             title, 
-            excerpt or f"Insights on {topic}",
+            excerpt,
             content, 
             category,
             meta_desc,
             json.dumps(keywords),
             json.dumps(hashtags),
-            json.dumps(search_queries)
+            json.dumps(search_queries),
+            *(derived[c] for c in DERIVED_COLUMNS)
         ))
         
         post_id = cur.fetchone()['id']
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_posts(post_id=post_id, slug=slug)
+        _clear_pending_run()
+        notify_stage(on_stage, "insert", "finished")
         
         print(f"✅ Published Insight: {title} [{category}]")
         print(f"   📊 SEO Data:")
@@ -641,6 +816,7 @@ def publish_post(emergency_override=False):
         return {"success": True, "id": post_id, "title": title}
         
     except Exception as e:
+        notify_stage(on_stage, "insert", "failed")
         print(f"❌ Database Insert Error: {e}")
         import traceback
         traceback.print_exc()
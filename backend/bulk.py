@@ -0,0 +1,255 @@
+"""
+Bulk import/export of posts as NDJSON (one JSON object per line)
+Export streams rows from a server-side cursor; import reads line by line and upserts on slug in
+batches with execute_values, so tens of thousands of posts move in seconds with constant memory.
+A batch that fails is replayed row by row under savepoints, so one bad row is reported with its
+line number instead of failing the whole batch.
+Legacy stores (data/posts.json, data/drafts.json, content/posts.json) are accepted as import input.
+
+Usage: python bulk.py export [--out FILE] [--published-only]
+       python bulk.py import FILE [FILE ...] [--batch-size 500]   (FILE may be .ndjson, legacy .json or -)
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime, timezone
+
+from psycopg2.extras import execute_values
+
+from cache import invalidate_posts
+from db import get_db_connection
+from enrich import DERIVED_COLUMNS, derive
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))  # Per-row errors kept in the summary
+
+# Importable columns, in insert order; id, created_at and search_vector are owned by the database.
+# Derived fields are always recomputed from content, whatever the input says.
+IMPORT_COLUMNS = [
+    "slug", "title", "excerpt", "content", "published", "author", "tags",
+    "meta_description", "keywords", "hashtags", "search_queries", "image", "date",
+] + DERIVED_COLUMNS
+EXPORT_COLUMNS = ["id"] + [c for c in IMPORT_COLUMNS if c not in ("minhash", "lsh_bands")] + ["created_at", "updated_at"]
+JSON_LIST_COLUMNS = {"keywords", "hashtags", "search_queries"}  # Stored as JSON text
+
+UPSERT = f"""
+    INSERT INTO posts ({", ".join(IMPORT_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (slug) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in IMPORT_COLUMNS if c != "slug")},
+        updated_at = NOW()
+    RETURNING (xmax = 0) AS inserted
+"""
+# A row without a date keeps the existing post's date on re-import; only new posts get NOW()
+ROW_TEMPLATE = "(" + ", ".join(
+    "COALESCE(%s, (SELECT p.date FROM posts p WHERE p.slug = %s), NOW())" if c == "date" else "%s"
+    for c in IMPORT_COLUMNS
+) + ")"
+_DATE_END = IMPORT_COLUMNS.index("date") + 1
+
+def _params(row):
+    """Query parameters for ROW_TEMPLATE: the row, with the slug again after date for the fallback"""
+    return row[:_DATE_END] + (row[0],) + row[_DATE_END:]
+
+def _to_bool(value):
+    if isinstance(value, str):
+        if value.strip().lower() in ("true", "1", "yes", "published"):
+            return True
+        if value.strip().lower() in ("false", "0", "no", "draft", ""):
+            return False
+        raise ValueError(f"not a boolean: {value!r}")
+    return bool(value)
+
+def _to_timestamp(value):
+    """ISO string or epoch (s or ms) -> naive UTC datetime, matching the TIMESTAMP columns"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        parsed = datetime.fromtimestamp(value / 1000 if value > 1e11 else value, timezone.utc)
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def normalize(record, default_published=True):
+    """One input object -> tuple in IMPORT_COLUMNS order; raises ValueError with the reason"""
+    if not isinstance(record, dict):
+        raise ValueError("line is not a JSON object")
+    missing = [k for k in ("slug", "title", "content") if not record.get(k)]
+    if missing:
+        raise ValueError(f"missing required field(s): {', '.join(missing)}")
+
+    content, derived = derive(str(record["content"]), record.get("excerpt"))
+    published = record.get("published")
+    if published is None:
+        published = record["status"] == "published" if "status" in record else default_published
+    values = {
+        "slug": str(record["slug"]).strip(),
+        "title": str(record["title"]),
+        "excerpt": record.get("excerpt") or "",
+        "content": content,
+        "published": _to_bool(published),
+        "author": record.get("author") or "WaveSignals",
+        "tags": ", ".join(record["tags"]) if isinstance(record.get("tags"), list) else (record.get("tags") or ""),
+        "meta_description": record.get("meta_description"),
+        "image": record.get("image") or "",
+        "date": _to_timestamp(record.get("date")),
+        **derived,
+    }
+    for column in JSON_LIST_COLUMNS:
+        value = record.get(column)
+        values[column] = json.dumps(value) if isinstance(value, (list, dict)) else value
+    return tuple(values[c] for c in IMPORT_COLUMNS)
+
+def read_ndjson(stream, default_published=True):
+    """Yield (line_no, tuple or None, error) for each non-blank line of a text or bytes stream"""
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, normalize(json.loads(line), default_published), None
+        except (TypeError, ValueError) as e:  # json.JSONDecodeError is a ValueError
+            yield line_no, None, str(e)
+
+def legacy_rows(data):
+    """Yield (index, tuple or None, error) from a legacy JSON store: a list, {"posts": [...]} or {"drafts": [...]}"""
+    default_published = True
+    if isinstance(data, dict):
+        default_published = "drafts" not in data
+        data = data.get("posts", data.get("drafts", []))
+    for index, record in enumerate(data, 1):
+        try:
+            yield index, normalize(record, default_published), None
+        except (TypeError, ValueError) as e:
+            yield index, None, str(e)
+
+def read_legacy(path):
+    with open(path, encoding="utf-8") as f:
+        return legacy_rows(json.load(f))
+
+def _upsert_batch(cur, batch, summary):
+    """batch is [(line_no, row)]; duplicates of a slug within a batch keep the last one"""
+    latest = {}
+    for line_no, row in batch:
+        latest[row[0]] = (line_no, row)
+    rows = list(latest.values())
+    summary["duplicates"] += len(batch) - len(rows)
+
+    cur.execute("SAVEPOINT bulk_batch")
+    try:
+        results = execute_values(cur, UPSERT, [_params(row) for _, row in rows], template=ROW_TEMPLATE,
+                                 page_size=len(rows), fetch=True)
+        cur.execute("RELEASE SAVEPOINT bulk_batch")
+    except Exception:
+        cur.execute("ROLLBACK TO SAVEPOINT bulk_batch")
+        results = []
+        for line_no, row in rows:  # Replay one at a time to find the bad rows
+            cur.execute("SAVEPOINT bulk_row")
+            try:
+                results += execute_values(cur, UPSERT, [_params(row)], template=ROW_TEMPLATE, fetch=True)
+                cur.execute("RELEASE SAVEPOINT bulk_row")
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                _record_error(summary, line_no, row[0], str(e).strip().splitlines()[0])
+
+    inserted = sum(1 for r in results if r["inserted"])
+    summary["inserted"] += inserted
+    summary["updated"] += len(results) - inserted
+
+def _record_error(summary, line_no, slug, error):
+    summary["failed"] += 1
+    if len(summary["errors"]) < BULK_MAX_ERRORS:
+        summary["errors"].append({"line": line_no, "slug": slug, "error": error})
+
+def import_rows(rows, batch_size=BULK_BATCH_SIZE):
+    """Upsert (line_no, row, error) items from read_ndjson/read_legacy; each batch commits on its own"""
+    summary = {"inserted": 0, "updated": 0, "failed": 0, "duplicates": 0, "errors": []}
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        batch = []
+        for line_no, row, error in rows:
+            if error:
+                _record_error(summary, line_no, None, error)
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= batch_size:
+                _upsert_batch(cur, batch, summary)
+                conn.commit()
+                batch = []
+        if batch:
+            _upsert_batch(cur, batch, summary)
+            conn.commit()
+        cur.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if summary["inserted"] or summary["updated"]:
+            invalidate_posts()
+    return summary
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def export_ndjson(published_only=False, itersize=1000):
+    """Yield one NDJSON line per post, oldest first, from a named cursor"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor(name="bulk_export")
+        cur.itersize = itersize
+        cur.execute(f"""
+            SELECT {", ".join(EXPORT_COLUMNS)}
+            FROM posts
+            {"WHERE published = TRUE" if published_only else ""}
+            ORDER BY id
+        """)
+        for row in cur:
+            yield json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+def _read_input(path):
+    if path == "-":
+        return read_ndjson(sys.stdin)
+    if path.endswith(".json"):
+        return read_legacy(path)
+    return read_ndjson(open(path, encoding="utf-8"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import/export posts as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="Write every post as NDJSON")
+    export_cmd.add_argument("--out", default="-", help="Output file (default stdout)")
+    export_cmd.add_argument("--published-only", action="store_true")
+    import_cmd = commands.add_parser("import", help="Upsert posts from NDJSON or legacy JSON files")
+    import_cmd.add_argument("files", nargs="+")
+    import_cmd.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+        count = 0
+        for line in export_ndjson(args.published_only):
+            out.write(line)
+            count += 1
+        if out is not sys.stdout:
+            out.close()
+        print(f"✅ Exported {count} posts", file=sys.stderr)
+    else:
+        for path in args.files:
+            summary = import_rows(_read_input(path), args.batch_size)
+            print(f"{'✅' if not summary['failed'] else '⚠️'} {path}: {summary['inserted']} inserted, "
+                  f"{summary['updated']} updated, {summary['failed']} failed", file=sys.stderr)
+            for error in summary["errors"]:
+                print(f"   line {error['line']} ({error['slug'] or '-'}): {error['error']}", file=sys.stderr)
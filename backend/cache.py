@@ -0,0 +1,103 @@
+"""
+In-process read-through cache for the public read endpoints
+Bounded LRU with per-entry TTL; write paths invalidate entries explicitly
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))  # Seconds; bounds staleness from other processes (scheduler.py)
+POSTS_FINGERPRINT_TTL = float(os.getenv("POSTS_FINGERPRINT_TTL", "5"))  # Seconds a worker reuses the posts fingerprint
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key):
+        """Return (hit, value); a hit can carry None (e.g. a cached 404)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def delete_where(self, predicate):
+        """Drop every entry for which predicate(key, value) is true"""
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+            self._stats["invalidations"] += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._data),
+                "max_size": self.maxsize,
+                "ttl": self.ttl,
+                "hit_ratio": (self._stats["hits"] / lookups) if lookups else 0.0,
+            }
+
+# Keys: ("posts", <query>, fingerprint) listing and search pages, ("post", slug, fingerprint) single posts,
+# ("settings",) site config. The posts fingerprint (db.read_posts_fingerprint) in a key makes another
+# worker's write a cache miss here within POSTS_FINGERPRINT_TTL instead of CACHE_TTL.
+read_cache = TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+fingerprint_cache = TTLCache(maxsize=1, ttl=POSTS_FINGERPRINT_TTL)
+
+def invalidate_posts(post_id=None, slug=None):
+    """Forget every listing page plus the given post (by slug and/or id), and the posts fingerprint"""
+    def doomed(key, value):
+        if key[0] == "posts":
+            return True
+        if key[0] != "post":
+            return False
+        if slug is not None and key[1] == slug:
+            return True
+        return post_id is not None and isinstance(value, dict) and value.get("id") == post_id
+
+    read_cache.delete_where(doomed)
+    fingerprint_cache.clear()
+
+def invalidate_settings():
+    read_cache.delete(("settings",))
+
+def get_cache_stats():
+    return read_cache.stats()
@@ -4,9 +4,10 @@ Provides real-time monitoring interface for backend health, blog generation, and
 """
 
 import gradio as gr
-from bot import publish_post
-from db import get_db_connection
+from db import get_db_connection, get_post_counts
+from progress import EventStream
 import os
+import threading
 from datetime import datetime
 import json
 
@@ -30,10 +31,43 @@ def generate_blog_manual():
         log_event("manual_trigger", {"source": "dashboard", "time": datetime.now().isoformat()})
         
         # Show starting message
-        yield "🚀 **Starting blog generation...**\n\nThis may take 30-60 seconds.\n", ""
-        
-        result = publish_post()
-        
+        header = "🚀 **Starting blog generation...**\n\nThis may take 30-60 seconds.\n"
+        yield header, ""
+
+        from bot import publish_post  # Imported on first use to keep the dashboard's boot fast
+
+        # Run generation in a thread and render its stage/token events as they stream in
+        stream = EventStream()
+        on_stage, on_token = stream.callbacks()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = publish_post(on_stage=on_stage, on_token=on_token)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                stream.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        stages, current, preview = {}, None, ""
+        for item in stream.iter(timeout=5):
+            if item is None:
+                continue
+            event, data = item
+            if event == "stage":
+                stages[data["stage"]] = data["status"]
+            elif event == "token":
+                if data["stage"] != current:
+                    current, preview = data["stage"], ""
+                preview = (preview + data["text"])[-600:]
+            lines = [f"- {'✅' if status == 'finished' else '❌' if status == 'failed' else '⏳'} {name}" for name, status in stages.items()]
+            yield header + "\n" + "\n".join(lines) + (f"\n\n**{current}:** …{preview}" if preview else ""), f"⏳ {current or 'working'}"
+
+        if "error" in outcome:
+            raise outcome["error"]
+        result = outcome.get("result")
+
         if isinstance(result, dict) and result.get("success"):
             message = f"""✅ **Success!**
 
@@ -81,13 +115,10 @@ def get_system_status():
                 cur.execute("SELECT title, date FROM posts ORDER BY date DESC LIMIT 5")
                 recent = cur.fetchall()
                 
-                # Get total post count
-                cur.execute("SELECT COUNT(*) as count FROM posts")
-                total_posts = cur.fetchone()['count']
-                
-                # Get posts today
-                cur.execute("SELECT COUNT(*) as count FROM posts WHERE date > NOW() - INTERVAL '24 hours'")
-                posts_today = cur.fetchone()['count']
+                # Post counts (maintained counters, no table scan)
+                counts = get_post_counts(cur)
+                total_posts = counts["total"]
+                posts_today = counts["posts_24h"]
                 
                 cur.close()
                 conn.close()
@@ -184,8 +215,7 @@ def check_frontend_sync():
         conn = get_db_connection()
         if conn:
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) as count FROM posts WHERE published = TRUE")
-            published_count = cur.fetchone()['count']
+            published_count = get_post_counts(cur)["published"]
             cur.close()
             conn.close()
             
@@ -287,7 +317,7 @@ with gr.Blocks(title="WaveSignals Control Dashboard", theme=gr.themes.Soft()) as
     - [Hugging Face Space Settings](https://huggingface.co/spaces/mahendercreates/wavesignals-backend/settings)
     
     ### ⚙️ External Setup Required
-    - **Cron Job:** Setup at [cron-job.org](https://cron-job.org) to ping `/health` every 5 minutes
+    - **Cron Job:** Setup at [cron-job.org](https://cron-job.org) to ping `/livez` every 5 minutes (`/readyz` for alerting)
     - **Make.com:** Create automation for 2x daily post generation (optional backup)
     """)
 
@@ -1,6 +1,11 @@
 import os
+import threading
+import weakref
 import psycopg2
+from psycopg2.extensions import connection as _pg_connection
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
 from dotenv import load_dotenv
 import time
 
@@ -8,14 +13,236 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool settings (process-wide, shared by every thread)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Max seconds to wait for a free connection
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))  # Ping connections idle longer than this
+
+class PooledConnection(_pg_connection):
+    """psycopg2 connection whose close() hands it back to the pool"""
+
+    _pool = None
+    _last_used = 0.0
+
+    def close(self):
+        pool = self._pool
+        if pool is not None:
+            pool.putconn(self)
+        else:
+            _pg_connection.close(self)
+
+    def _really_close(self):
+        self._pool = None
+        try:
+            _pg_connection.close(self)
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """Thread-safe pool of PooledConnection objects with health checks and stats"""
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0, check_after=30.0):
+        self.dsn = dsn
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.check_after = check_after
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []  # LIFO stack of ready connections
+        self._in_use = {}  # id(conn) -> weakref, so leaked connections are reclaimed on GC
+        self._opening = 0  # Connections being opened outside the lock
+
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "replaced": 0,
+            "leaked": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+        for _ in range(self.minconn):
+            try:
+                self._idle.append(self._connect())
+            except Exception as e:
+                print(f"⚠️ Could not pre-open pooled connection: {e}")
+                break
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection, cursor_factory=RealDictCursor)
+        conn._last_used = time.monotonic()
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Cheap checks first; only ping the server if the connection sat idle for a while"""
+        if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - conn._last_used < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _track(self, conn):
+        key = id(conn)
+
+        def _reclaim(_ref, key=key):
+            # Caller dropped the connection without close(); psycopg2 closes the socket on dealloc
+            with self._cond:
+                if self._in_use.pop(key, None) is not None:
+                    self._stats["leaked"] += 1
+                    self._cond.notify()
+
+        self._in_use[key] = weakref.ref(conn, _reclaim)
+        conn._pool = self
+        self._stats["checkouts"] += 1
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to `timeout` seconds when the pool is full"""
+        started = time.monotonic()
+        waited = False
+        deadline = started + self.timeout
+
+        with self._cond:
+            while not self._idle and self._size() >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolError(f"connection pool exhausted ({self.maxconn} in use)")
+                waited = True
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._opening += 1  # Reserve the slot while we check/open outside the lock
+
+        # Network I/O (ping, reconnect) happens outside the lock
+        replaced = False
+        try:
+            if conn is not None and not self._is_healthy(conn):
+                conn._really_close()
+                conn = None
+                replaced = True
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._stats["replaced"] += int(replaced)
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._opening -= 1
+            self._stats["replaced"] += int(replaced)
+            self._track(conn)
+            self._record_wait(started, waited)
+        return conn
+
+    def _record_wait(self, started, waited):
+        if not waited:
+            return
+        elapsed = time.monotonic() - started
+        self._stats["waits"] += 1
+        self._stats["wait_time_total"] += elapsed
+        self._stats["wait_time_max"] = max(self._stats["wait_time_max"], elapsed)
+
+    def putconn(self, conn):
+        """Return a connection to the pool, resetting any open transaction"""
+        conn._pool = None
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                # Not ours (already returned, or pool was reset)
+                healthy = False
+            elif healthy and len(self._idle) < self.maxconn:
+                conn._last_used = time.monotonic()
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+            self._cond.notify()
+        conn._really_close()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn._really_close()
+
+    def stats(self):
+        with self._cond:
+            waits = self._stats["waits"]
+            return {
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "size": self._size(),
+                "min": self.minconn,
+                "max": self.maxconn,
+                **self._stats,
+                "wait_time_avg": (self._stats["wait_time_total"] / waits) if waits else 0.0,
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use (and again after fork)"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            # Never reuse sockets inherited from a parent process
+            _pool = ConnectionPool(
+                DATABASE_URL,
+                minconn=DB_POOL_MIN,
+                maxconn=DB_POOL_MAX,
+                timeout=DB_POOL_TIMEOUT,
+                check_after=DB_POOL_CHECK_AFTER,
+            )
+        return _pool
+
+def get_pool_stats():
+    """Pool statistics (in-use, idle, wait time...) or None if the pool was never created"""
+    if _pool is None or _pool.pid != os.getpid():
+        return None
+    return _pool.stats()
+
 def get_db_connection(retry_count=3):
-    """Get database connection with retry logic"""
+    """Get a pooled database connection with retry logic.
+
+    Callers use it exactly like a plain psycopg2 connection; close() returns it to the pool.
+    """
     for attempt in range(retry_count):
         try:
-            conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+            conn = get_pool().getconn()
             if attempt > 0:
                 print(f"✅ Database connected on attempt {attempt + 1}")
             return conn
+        except PoolError as e:
+            # Pool is saturated, not broken: waiting again would just double the latency
+            print(f"❌ {e}")
+            return None
         except Exception as e:
             print(f"❌ Database connection attempt {attempt + 1}/{retry_count} failed: {e}")
             if attempt < retry_count - 1:
@@ -24,65 +251,55 @@ def get_db_connection(retry_count=3):
                 print(f"🔴 All {retry_count} connection attempts failed")
                 return None
 
+def get_post_counts(cur, days=30):
+    """Post counters from the trigger-maintained post_stats table (migrations/0003_post_stats.sql).
+
+    Returns total/published counts, per-tag counts and per-day counts for the last `days` days,
+    plus posts in the last 24 hours (an index range scan on posts.date, bounded by recent posts).
+    """
+    cur.execute("""
+        SELECT scope, key, total, published FROM post_stats
+        WHERE scope IN ('all', 'tag')
+           OR (scope = 'day' AND key >= to_char(CURRENT_DATE - %s, 'YYYY-MM-DD'))
+    """, (days,))
+    counts = {"total": 0, "published": 0, "by_tag": {}, "by_day": {}}
+    for row in cur.fetchall():
+        if row['scope'] == 'all':
+            counts["total"], counts["published"] = row['total'], row['published']
+        elif row['total']:
+            bucket = counts["by_tag"] if row['scope'] == 'tag' else counts["by_day"]
+            bucket[row['key']] = {"total": row['total'], "published": row['published']}
+    cur.execute("SELECT COUNT(*) AS count FROM posts WHERE date > NOW() - INTERVAL '24 hours'")
+    counts["posts_24h"] = cur.fetchone()['count']
+    return counts
+
+def read_posts_fingerprint(cur):
+    """(published count, changes, last change) of the posts table, read from the database so every
+    worker computes the same validators. changes counts deletions and content rewrites, which
+    updated_at misses (migrations/0008_post_deletions.sql, 0010_post_revisions.sql); last change
+    includes deletions.
+    """
+    cur.execute("""
+        SELECT COALESCE(s.published, 0) AS count, COALESCE(s.deleted + s.revision, 0) AS changes,
+               GREATEST((SELECT MAX(updated_at) FROM posts), s.last_deleted_at) AS last_modified
+        FROM (SELECT 1) AS one
+        LEFT JOIN post_stats s ON s.scope = 'all' AND s.key = ''
+    """)
+    row = cur.fetchone()
+    return row['count'], row['changes'], row['last_modified']
+
 def init_db():
-    conn = get_db_connection()
-    if not conn:
-        return
-    
+    """Bring the schema up to date via the versioned migrations in migrations/ (see migrate.py).
+
+    When nothing is pending this is one query instead of a round of CREATE TABLE IF NOT EXISTS.
+    Returns False if the database could not be reached or a migration failed.
+    """
+    from migrate import migrate
     try:
-        cur = conn.cursor()
-        # Create Posts Table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY,
-                slug TEXT UNIQUE NOT NULL,
-                title TEXT NOT NULL,
-                excerpt TEXT,
-                content TEXT NOT NULL,
-                published BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                author TEXT DEFAULT 'WaveSignals',
-                tags TEXT,
-                meta_description TEXT,
-                keywords TEXT,
-                hashtags TEXT,
-                search_queries TEXT,
-                image TEXT
-            );
-        """)
-
-        # Create Settings Table (Singleton)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                id SERIAL PRIMARY KEY,
-                config JSONB DEFAULT '{}'::jsonb
-            );
-        """)
-        
-        # Create Subscribers Table - CRITICAL FIX
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS subscribers (
-                id SERIAL PRIMARY KEY,
-                email TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active'
-            );
-        """)
-        
-        # Ensure one row exists
-        cur.execute("SELECT COUNT(*) as count FROM settings")
-        if cur.fetchone()['count'] == 0:
-            cur.execute("INSERT INTO settings (id, config) VALUES (1, '{}')")
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        print("✅ Database initialized successfully")
-        print("   - posts table created")
-        print("   - settings table created") 
-        print("   - subscribers table created")
+        return migrate() is not None
     except Exception as e:
         print(f"❌ Error initializing DB: {e}")
+        return False
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,140 @@
+"""
+Publish-time derived fields
+Word count, reading time, a heading table of contents, a plain-text excerpt, a content hash and
+the near-duplicate signature (see similarity.py) are computed once when a post is written and stored on the posts row, so readers and listings
+never parse HTML per request. Headings without an id get one, so TOC links resolve.
+
+Usage: python enrich.py [--all]   (backfills rows with no content_hash, or every row)
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import math
+import os
+import re
+
+from psycopg2.extras import execute_values
+
+from cache import invalidate_posts
+from db import get_db_connection
+from similarity import lsh_bands, signature
+
+WORDS_PER_MINUTE = int(os.getenv("WORDS_PER_MINUTE", "230"))
+EXCERPT_CHARS = int(os.getenv("EXCERPT_CHARS", "200"))
+DERIVED_COLUMNS = ["word_count", "reading_minutes", "toc", "plain_excerpt", "content_hash", "minhash", "lsh_bands"]
+
+HEADING = re.compile(r"<h([23])(\s[^>]*)?>(.*?)</h\1\s*>", re.IGNORECASE | re.DOTALL)
+ID_ATTR = re.compile(r"""(?<![\w-])id\s*=\s*["']([^"']+)["']""", re.IGNORECASE)  # Not data-id= etc.
+INVISIBLE = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+
+def plain_text(markup):
+    """Visible text of an HTML fragment, whitespace collapsed"""
+    text = TAG.sub(" ", INVISIBLE.sub(" ", markup or ""))
+    return " ".join(html.unescape(text).split())
+
+def _anchor(text, taken):
+    base = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "section"
+    anchor, n = base, 2
+    while anchor in taken:
+        anchor, n = f"{base}-{n}", n + 1
+    taken.add(anchor)
+    return anchor
+
+def add_heading_ids(content):
+    """(content with an id on every h2/h3, [{"level", "text", "id"}]).
+
+    TOC text stays HTML-escaped: the frontend renders it with innerHTML.
+    """
+    toc, taken = [], set()
+
+    def replace(match):
+        level, attrs, inner = match.group(1), match.group(2) or "", match.group(3)
+        text = plain_text(inner)
+        existing = ID_ATTR.search(attrs)
+        if existing:
+            anchor = existing.group(1)
+            taken.add(anchor)
+        else:
+            anchor = _anchor(text, taken)
+            attrs = f'{attrs} id="{anchor}"'
+        toc.append({"level": int(level), "text": html.escape(text, quote=False), "id": anchor})
+        return f"<h{level}{attrs}>{inner}</h{level}>"
+
+    return HEADING.sub(replace, content or ""), toc
+
+def truncate(text, limit=EXCERPT_CHARS):
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0].rstrip(",.;:-") + "…"
+
+def derive(content, excerpt=None):
+    """(content, derived fields) for a post body; content gains heading ids"""
+    content, toc = add_heading_ids(content)
+    text = plain_text(content)
+    words = len(text.split())
+    sig = signature(text)
+    return content, {
+        "word_count": words,
+        "reading_minutes": max(1, math.ceil(words / WORDS_PER_MINUTE)),
+        "toc": json.dumps(toc),
+        "plain_excerpt": truncate(plain_text(excerpt) or text),
+        "content_hash": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+        "minhash": sig,
+        "lsh_bands": lsh_bands(sig) if sig else None,
+    }
+
+def backfill(everything=False, batch_size=200):
+    """Enrich rows written before these columns existed (or every row); returns False if the DB is down.
+
+    updated_at is left alone: derived fields are not an editorial change, and sitemap <lastmod>,
+    feed <updated> and Last-Modified all read it. ETags still change: post ETags include content_hash
+    and the listing fingerprint counts content rewrites (migrations/0010_post_revisions.sql).
+    """
+    conn = get_db_connection()
+    if not conn:
+        return False
+    updated, last_id = 0, 0
+    try:
+        cur = conn.cursor()
+        while True:
+            cur.execute(f"""
+                SELECT id, content, excerpt FROM posts
+                WHERE id > %s {"" if everything else "AND content_hash IS NULL"}
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            values = []
+            for row in rows:
+                content, fields = derive(row['content'], row['excerpt'])
+                values.append((row['id'], content, *(fields[c] for c in DERIVED_COLUMNS)))
+            execute_values(cur, """
+                UPDATE posts SET content = v.content, word_count = v.word_count,
+                    reading_minutes = v.reading_minutes, toc = v.toc::jsonb,
+                    plain_excerpt = v.plain_excerpt, content_hash = v.content_hash,
+                    minhash = v.minhash::bigint[], lsh_bands = v.lsh_bands::bigint[]
+                FROM (VALUES %s) AS v (id, content, word_count, reading_minutes, toc, plain_excerpt, content_hash,
+                                       minhash, lsh_bands)
+                WHERE posts.id = v.id
+            """, values, page_size=len(values))
+            conn.commit()
+            updated += cur.rowcount
+            last_id = rows[-1]['id']
+        cur.close()
+    finally:
+        conn.close()
+    if updated:
+        invalidate_posts()
+        print(f"✅ Derived fields computed for {updated} posts")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute derived post fields for existing rows")
+    parser.add_argument("--all", action="store_true", help="Recompute every row, not just missing ones")
+    args = parser.parse_args()
+    if not backfill(everything=args.all):
+        print("❌ Database connection failed")
@@ -0,0 +1,377 @@
+"""
+Static site export
+Renders published posts from Postgres into plain HTML that a CDN can serve with no backend calls:
+one page per post, paginated listing pages, per-tag pages and a compact posts.json index.
+Exports are incremental - a post page is only re-rendered when its content hash changes - and
+every file is written atomically (temp file + rename), so a deploy never sees half a page.
+The manifest also records each tag's directory, so published tag URLs never move between runs.
+
+Usage: python export.py [--out DIR] [--page-size 20] [--full]
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from db import get_db_connection
+from feeds import SITE_URL, post_url
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(REPO_ROOT, "dist"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "20"))
+TEMPLATE_VERSION = "1"  # Bump when the templates below change so every page is re-rendered
+MANIFEST_NAME = ".export-manifest.json"
+STATIC_ASSETS = ["styles", "public", "favicon.svg"]  # Copied from the repo so the export is self-contained
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>{title}</title>
+  <meta name="description" content="{description}">
+  <link rel="canonical" href="{canonical}">
+  <meta property="og:title" content="{title}">
+  <meta property="og:description" content="{description}">
+  <meta property="og:url" content="{canonical}">
+  <meta property="og:image" content="{site_url}/public/og-default.png">
+  <link rel="icon" href="/favicon.svg" type="image/svg+xml">
+  <link rel="stylesheet" href="/styles/main.css">
+
+  <!-- Google Analytics 4 Tracking -->
+  <script async src="https://www.googletagmanager.com/gtag/js?id=G-RGL9J7FMMN"></script>
+  <script>
+    window.dataLayer = window.dataLayer || [];
+    function gtag() {{ dataLayer.push(arguments); }}
+    gtag('js', new Date());
+    gtag('config', 'G-RGL9J7FMMN');
+  </script>
+</head>
+
+<body>
+
+  <header class="site-header">
+    <div class="header-container">
+      <a href="/" class="site-logo">
+        <img src="/public/logo-header.svg" alt="WaveSignals">
+      </a>
+      <nav class="site-nav">
+        <a href="/blog/">Signals</a>
+        <a href="/about.html">About</a>
+        <a href="/contact.html">Contact</a>
+      </nav>
+    </div>
+  </header>
+
+{body}
+
+  <footer class="site-footer" style="border-top: 1px solid #e6e6e6; padding: 24px 0; margin-top: 64px; text-align: center; font-size: 13px; color: #999;">
+    © WaveSignals · Part of <a href="https://waveseed.app" target="_blank" rel="noopener" style="color: #1A8917;">WaveSeed</a>
+    · <a href="/terms.html" style="color: #666;">Terms</a> · <a href="/privacy.html" style="color: #666;">Privacy</a>
+  </footer>
+
+</body>
+
+</html>
+"""
+
+SAFE_SLUG = re.compile(r"^[A-Za-z0-9][\w-]*$")
+
+CHIP = '<span style="display: inline-block; padding: 0.25rem 0.75rem; background: var(--gray-100); color: var(--gray-700); font-size: var(--text-sm); border-radius: 4px; font-family: var(--font-sans);">{}</span>'
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").lower()).strip("-") or "untagged"
+
+def _list_field(value):
+    """keywords/hashtags are stored as JSON arrays, older rows as "{a,b}" strings"""
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+        if isinstance(parsed, list):
+            return [str(v) for v in parsed if v]
+    except (TypeError, ValueError):
+        pass
+    return [v.strip() for v in str(value).strip("{}").split(",") if v.strip()]
+
+def _display_date(value):
+    return f"{value:%B} {value.day}, {value.year}" if value else ""
+
+def tag_slugs(tags, slugs=None):
+    """{tag: directory name}; tags that slugify alike ("C++" and "C") get -2, -3... in sorted order.
+
+    Tags already in `slugs` keep their directory; new ones are added around them.
+    """
+    slugs = dict(slugs or {})
+    taken = set(slugs.values())
+    for tag in sorted(set(tags) - set(slugs)):
+        base = slug = slugify(tag)
+        n = 2
+        while slug in taken:
+            slug, n = f"{base}-{n}", n + 1
+        if slug != base:
+            print(f"⚠️ Tag {tag!r} collides with another tag as /tags/{base}/, exported as /tags/{slug}/")
+        taken.add(slug)
+        slugs[tag] = slug
+    return slugs
+
+def page_hash(post, tag_slug):
+    """Fingerprint of a rendered post page; the body is covered by posts.content_hash (enrich.derive)"""
+    body = post.get("content_hash") or hashlib.sha256((post.get("content") or "").encode("utf-8")).hexdigest()
+    parts = [TEMPLATE_VERSION, SITE_URL, tag_slug, body] + [str(post.get(k) or "") for k in (
+        "title", "excerpt", "meta_description", "tags", "keywords", "hashtags", "date"
+    )]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def render_post(post, tag_slug):
+    keywords = _list_field(post.get("keywords"))
+    hashtags = _list_field(post.get("hashtags"))
+    meta = ""
+    if keywords:
+        meta += '    <h4 style="margin-bottom: 0.75rem;">Topics</h4>\n    <div style="display: flex; flex-wrap: wrap; gap: 0.5rem; margin-bottom: 1.5rem;">' \
+                + "".join(CHIP.format(html.escape(k)) for k in keywords) + "</div>\n"
+    if hashtags:
+        meta += '    <h4 style="margin-bottom: 0.75rem;">Tags</h4>\n    <div style="display: flex; flex-wrap: wrap; gap: 0.5rem;">' \
+                + "".join(CHIP.format(html.escape(h)) for h in hashtags) + "</div>\n"
+    tag = post.get("tags") or "Essay"
+    body = f"""  <article class="container">
+    <header class="article-header">
+      <div class="article-meta">{_display_date(post.get("date"))} · <a href="/tags/{tag_slug}/">{html.escape(tag)}</a></div>
+      <h1>{html.escape(post["title"])}</h1>
+    </header>
+    <div class="article-content">{post.get("content") or ""}</div>
+    <div style="margin-top: 3rem; padding-top: 2rem; border-top: 1px solid var(--gray-200);">
+{meta}    </div>
+  </article>"""
+    return PAGE.format(
+        title=html.escape(f"{post['title']} – WaveSignals"),
+        description=html.escape(post.get("meta_description") or post.get("excerpt") or ""),
+        canonical=post_url(post['slug']),
+        site_url=SITE_URL,
+        body=body,
+    )
+
+def render_listing(heading, posts, page, pages, base_path):
+    items = "\n".join(f"""      <li class="article-item">
+        <div class="article-meta">{_display_date(p["date"])} · {html.escape(p["tags"] or "Essay")}</div>
+        <h2 class="article-title"><a href="/posts/{p["slug"]}/">{html.escape(p["title"])}</a></h2>
+        {f'<p class="article-excerpt">{html.escape(p["excerpt"])}</p>' if p["excerpt"] else ""}
+      </li>""" for p in posts) or '      <li class="text-muted">No posts yet.</li>'
+
+    def page_url(n):
+        return base_path if n == 1 else f"{base_path}page/{n}/"
+
+    nav = []
+    if page > 1:
+        nav.append(f'<a href="{page_url(page - 1)}">← Newer</a>')
+    if page < pages:
+        nav.append(f'<a href="{page_url(page + 1)}">Older →</a>')
+    body = f"""  <main class="container">
+    <h1>{html.escape(heading)}</h1>
+    <ul class="article-list">
+{items}
+    </ul>
+    <nav style="display: flex; justify-content: space-between; margin-top: 2rem;">{" ".join(nav)}</nav>
+  </main>"""
+    title = heading if page == 1 else f"{heading} (page {page})"
+    return PAGE.format(
+        title=html.escape(f"{title} – WaveSignals"),
+        description=html.escape(f"{heading} from WaveSignals"),
+        canonical=f"{SITE_URL}{page_url(page)}",
+        site_url=SITE_URL,
+        body=body,
+    )
+
+def write_atomic(path, data):
+    """Write bytes/str via a temp file in the same directory and rename; skips identical content.
+
+    Returns True if the file changed.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+    return True
+
+def _published_tags(conn):
+    """Display tags of published posts, from the maintained post_stats counters"""
+    cur = conn.cursor()
+    cur.execute("SELECT key FROM post_stats WHERE scope = 'tag' AND published > 0")
+    tags = [row['key'] or "Essay" for row in cur.fetchall()]
+    cur.close()
+    return tags
+
+def _iter_published(conn):
+    """Stream published posts newest first through a server-side cursor"""
+    cur = conn.cursor(name="export_posts")
+    cur.itersize = 100
+    cur.execute("""
+        SELECT slug, title, excerpt, content, content_hash, date, tags, meta_description, keywords, hashtags
+        FROM posts
+        WHERE published = TRUE
+        ORDER BY date DESC, id DESC
+    """)
+    try:
+        for row in cur:
+            yield dict(row)
+    finally:
+        cur.close()
+
+def _copy_assets(out_dir):
+    for name in STATIC_ASSETS:
+        src = os.path.join(REPO_ROOT, name)
+        if os.path.isdir(src):
+            for root, _, files in os.walk(src):
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    with open(path, "rb") as f:
+                        write_atomic(os.path.join(out_dir, os.path.relpath(path, REPO_ROOT)), f.read())
+        elif os.path.isfile(src):
+            with open(src, "rb") as f:
+                write_atomic(os.path.join(out_dir, name), f.read())
+
+def _write_listing(out_dir, heading, posts, base_path, page_size):
+    pages = max(1, -(-len(posts) // page_size))
+    changed = 0
+    for page in range(1, pages + 1):
+        chunk = posts[(page - 1) * page_size:page * page_size]
+        rel = base_path.strip("/") if page == 1 else f"{base_path.strip('/')}/page/{page}"
+        changed += write_atomic(os.path.join(out_dir, rel, "index.html"),
+                                render_listing(heading, chunk, page, pages, base_path))
+    # Drop pages beyond the new last page (posts were unpublished or deleted)
+    page_dir = os.path.join(out_dir, base_path.strip("/"), "page")
+    if os.path.isdir(page_dir):
+        for name in os.listdir(page_dir):
+            if name.isdigit() and int(name) > pages:
+                shutil.rmtree(os.path.join(page_dir, name), ignore_errors=True)
+    return changed
+
+def _load_manifest(path):
+    """{"posts": {slug: page hash}, "tags": {tag: directory}} from the last export"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    return {"posts": manifest.get("posts") or {}, "tags": manifest.get("tags") or {}}
+
+def _exported_slugs(out_dir):
+    """Post directories on disk, which also covers pages a lost or older manifest doesn't list"""
+    posts_dir = os.path.join(out_dir, "posts")
+    if not os.path.isdir(posts_dir):
+        return set()
+    return {name for name in os.listdir(posts_dir) if os.path.isdir(os.path.join(posts_dir, name))}
+
+def export_site(out_dir=EXPORT_DIR, page_size=EXPORT_PAGE_SIZE, full=False):
+    """Export the site into out_dir; returns a summary of what was (re)written.
+
+    full re-renders every post page; removals and tag directories still come from the last export.
+    """
+    started = time.monotonic()
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = _load_manifest(manifest_path)
+    known = {} if full else previous["posts"]
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+
+    summaries, hashes = [], {}
+    rendered = 0
+    try:
+        slugs = tag_slugs(_published_tags(conn), previous["tags"])
+        for post in _iter_published(conn):
+            if not SAFE_SLUG.match(post["slug"] or ""):
+                print(f"⚠️ Skipping post with unsafe slug for a file path: {post['slug']!r}")
+                continue
+            tag = post.get("tags") or "Essay"
+            if tag not in slugs:  # Published since the tag list was read
+                slugs = tag_slugs([tag], slugs)
+            digest = page_hash(post, slugs[tag])
+            hashes[post["slug"]] = digest
+            page_path = os.path.join(out_dir, "posts", post["slug"], "index.html")
+            if known.get(post["slug"]) != digest or not os.path.exists(page_path):
+                write_atomic(page_path, render_post(post, slugs[tag]))
+                rendered += 1
+            summaries.append({
+                "slug": post["slug"],
+                "title": post["title"],
+                "excerpt": post.get("excerpt") or "",
+                "date": post["date"],
+                "tags": post.get("tags") or "",
+            })
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Posts that are gone or unpublished since the last export
+    removed = sorted((set(previous["posts"]) | _exported_slugs(out_dir)) - set(hashes))
+    for slug in removed:
+        shutil.rmtree(os.path.join(out_dir, "posts", slug), ignore_errors=True)
+
+    listings = _write_listing(out_dir, "Signals", summaries, "/blog/", page_size)
+    by_tag = {}
+    for post in summaries:
+        by_tag.setdefault(post["tags"] or "Essay", []).append(post)
+    for tag, posts in by_tag.items():
+        listings += _write_listing(out_dir, tag, posts, f"/tags/{slugs[tag]}/", page_size)
+    tags_dir = os.path.join(out_dir, "tags")
+    if os.path.isdir(tags_dir):
+        live = {slugs[tag] for tag in by_tag}
+        for name in os.listdir(tags_dir):
+            if name not in live:
+                shutil.rmtree(os.path.join(tags_dir, name), ignore_errors=True)
+
+    # Home page is the first listing page
+    with open(os.path.join(out_dir, "blog", "index.html"), encoding="utf-8") as f:
+        write_atomic(os.path.join(out_dir, "index.html"), f.read())
+
+    index = [{**p, "date": p["date"].isoformat() if p["date"] else None} for p in summaries]
+    write_atomic(os.path.join(out_dir, "posts.json"), json.dumps({"posts": index}, separators=(",", ":")))
+    _copy_assets(out_dir)
+    # Manifest last: if anything above failed, the next run re-renders those posts
+    write_atomic(manifest_path, json.dumps({"template": TEMPLATE_VERSION, "posts": hashes, "tags": slugs}, indent=0))
+
+    summary = {
+        "posts": len(summaries),
+        "rendered": rendered,
+        "unchanged": len(summaries) - rendered,
+        "removed": len(removed),
+        "listing_pages_changed": listings,
+        "tags": len(by_tag),
+        "seconds": round(time.monotonic() - started, 2),
+        "out_dir": out_dir,
+    }
+    print(f"📦 Static export: {rendered} rendered, {summary['unchanged']} unchanged, "
+          f"{len(removed)} removed in {summary['seconds']}s → {out_dir}")
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export published posts as a static site")
+    parser.add_argument("--out", default=EXPORT_DIR, help="Deploy directory (default: EXPORT_DIR or ../dist)")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    parser.add_argument("--full", action="store_true", help="Re-render every post, not just changed ones")
+    args = parser.parse_args()
+    print(json.dumps(export_site(os.path.abspath(args.out), args.page_size, args.full), indent=2))
@@ -0,0 +1,186 @@
+"""
+Sitemaps and RSS/Atom feeds streamed straight from Postgres
+Only slug/title/date/excerpt columns are read, through a server-side cursor, and XML is yielded
+row by row, so memory stays flat however many posts exist. Post sitemaps are split into shards of
+SITEMAP_SHARD_SIZE URLs (the protocol limit is 50,000) behind a sitemap index.
+
+The static site proxies /sitemap.xml, /sitemap-posts-N.xml, /rss.xml and /atom.xml here (_redirects).
+
+Usage: python feeds.py [--out DIR]   (writes sitemap.xml, sitemap-posts-N.xml, rss.xml, atom.xml)
+"""
+
+import argparse
+import os
+import tempfile
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from db import get_db_connection, read_posts_fingerprint
+
+SITE_URL = os.getenv("SITE_URL", "https://wavesignals.waveseed.app").rstrip("/")
+POST_URL_TEMPLATE = os.getenv("POST_URL_TEMPLATE", "{site}/posts/{slug}/")  # Canonical post URL, shared with export.py
+SITEMAP_SHARD_SIZE = min(int(os.getenv("SITEMAP_SHARD_SIZE", "50000")), 50000)
+FEED_SIZE = int(os.getenv("FEED_SIZE", "50"))
+FEED_TITLE = "WaveSignals"
+FEED_DESCRIPTION = "One signal per day. No noise."
+STATIC_SITEMAPS = ["sitemap-pages.xml"]  # Hand-maintained sitemaps that stay in the index
+
+def post_url(slug):
+    return POST_URL_TEMPLATE.format(site=SITE_URL, slug=slug)
+
+def shard_count(published_count):
+    return max(1, -(-published_count // SITEMAP_SHARD_SIZE))
+
+def _utc(ts):
+    if ts is None:
+        return datetime.now(timezone.utc)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+def _stream_rows(query, params, itersize=1000):
+    """Yield rows from a named (server-side) cursor; the connection is held only while iterating"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor(name="feed_rows")
+        cur.itersize = itersize
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+def sitemap_index(published_count):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for name in STATIC_SITEMAPS:
+        yield f"  <sitemap>\n    <loc>{escape(f'{SITE_URL}/{name}')}</loc>\n  </sitemap>\n"
+    for shard in range(1, shard_count(published_count) + 1):
+        yield f"  <sitemap>\n    <loc>{SITE_URL}/sitemap-posts-{shard}.xml</loc>\n  </sitemap>\n"
+    yield "</sitemapindex>\n"
+
+SHARD_ROWS = """
+    SELECT id, slug, COALESCE(updated_at, date) AS lastmod
+    FROM posts
+    WHERE published = TRUE
+    ORDER BY date, id
+    OFFSET %s LIMIT %s
+"""
+
+def _shard_params(shard):
+    return (shard - 1) * SITEMAP_SHARD_SIZE, SITEMAP_SHARD_SIZE
+
+def shard_fingerprint(shard):
+    """(URLs, digest of their ids, last change) of one sitemap shard, so its ETag only moves with its own slice"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT COUNT(*) AS count, md5(COALESCE(string_agg(id::text, ',' ORDER BY id), '')) AS digest,
+                   MAX(lastmod) AS last_modified
+            FROM ({SHARD_ROWS}) AS slice
+        """, _shard_params(shard))
+        row = cur.fetchone()
+        cur.close()
+        return row['count'], row['digest'], row['last_modified']
+    finally:
+        conn.close()
+
+def sitemap_shard(shard):
+    """URLs of published posts oldest first; shard N holds rows (N-1)*size .. N*size-1"""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    rows = _stream_rows(SHARD_ROWS, _shard_params(shard))
+    for row in rows:
+        yield (f"  <url>\n    <loc>{escape(post_url(row['slug']))}</loc>\n"
+               f"    <lastmod>{_utc(row['lastmod']).date().isoformat()}</lastmod>\n  </url>\n")
+    yield "</urlset>\n"
+
+def _latest_posts(limit):
+    return _stream_rows("""
+        SELECT slug, title, COALESCE(meta_description, excerpt, '') AS summary, tags, date, updated_at
+        FROM posts
+        WHERE published = TRUE
+        ORDER BY date DESC, id DESC
+        LIMIT %s
+    """, (limit,), itersize=limit)
+
+def rss_feed(last_modified=None, limit=FEED_SIZE):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>\n'
+    yield (f"  <title>{FEED_TITLE}</title>\n  <link>{SITE_URL}/</link>\n"
+           f"  <description>{escape(FEED_DESCRIPTION)}</description>\n"
+           f'  <atom:link href="{SITE_URL}/rss.xml" rel="self" type="application/rss+xml"/>\n'
+           f"  <lastBuildDate>{format_datetime(_utc(last_modified))}</lastBuildDate>\n")
+    for row in _latest_posts(limit):
+        url = escape(post_url(row['slug']))
+        category = f"    <category>{escape(row['tags'])}</category>\n" if row['tags'] else ""
+        yield (f"  <item>\n    <title>{escape(row['title'])}</title>\n    <link>{url}</link>\n"
+               f'    <guid isPermaLink="true">{url}</guid>\n'
+               f"    <pubDate>{format_datetime(_utc(row['date']))}</pubDate>\n{category}"
+               f"    <description>{escape(row['summary'])}</description>\n  </item>\n")
+    yield "</channel>\n</rss>\n"
+
+def atom_feed(last_modified=None, limit=FEED_SIZE):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield (f"  <title>{FEED_TITLE}</title>\n  <subtitle>{escape(FEED_DESCRIPTION)}</subtitle>\n"
+           f'  <link href="{SITE_URL}/"/>\n  <link href="{SITE_URL}/atom.xml" rel="self"/>\n'
+           f"  <id>{SITE_URL}/</id>\n  <updated>{_utc(last_modified).isoformat()}</updated>\n")
+    for row in _latest_posts(limit):
+        url = escape(post_url(row['slug']))
+        category = f"    <category term={quoteattr(row['tags'])}/>\n" if row['tags'] else ""
+        yield (f"  <entry>\n    <title>{escape(row['title'])}</title>\n"
+               f'    <link href="{url}"/>\n    <id>{url}</id>\n'
+               f"    <published>{_utc(row['date']).isoformat()}</published>\n"
+               f"    <updated>{_utc(row['updated_at'] or row['date']).isoformat()}</updated>\n{category}"
+               f"    <summary>{escape(row['summary'])}</summary>\n  </entry>\n")
+    yield "</feed>\n"
+
+def write_stream(path, chunks):
+    """Write a generator of text chunks to path atomically"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+def published_fingerprint():
+    """(published count, changes, last change), see db.read_posts_fingerprint"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        fingerprint = read_posts_fingerprint(cur)
+        cur.close()
+        return fingerprint
+    finally:
+        conn.close()
+
+def write_all(out_dir):
+    count, _, last_modified = published_fingerprint()
+    shards = shard_count(count)
+    write_stream(os.path.join(out_dir, "sitemap.xml"), sitemap_index(count))
+    for shard in range(1, shards + 1):
+        write_stream(os.path.join(out_dir, f"sitemap-posts-{shard}.xml"), sitemap_shard(shard))
+    write_stream(os.path.join(out_dir, "rss.xml"), rss_feed(last_modified))
+    write_stream(os.path.join(out_dir, "atom.xml"), atom_feed(last_modified))
+    print(f"✅ Sitemap index + {shards} shard(s) for {count} posts, rss.xml and atom.xml written to {out_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write sitemaps and RSS/Atom feeds")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), ".."), help="Site root directory")
+    args = parser.parse_args()
+    write_all(os.path.abspath(args.out))
@@ -0,0 +1,116 @@
+"""
+Background health prober
+Probes the database and scheduler on a timer and keeps the last result in memory, so /readyz and
+/health answer from a snapshot instead of touching Postgres on every ping. During an outage the
+database sees one probe per interval no matter how many monitors are polling.
+"""
+
+import os
+import threading
+import time
+
+from db import get_db_connection, get_post_counts
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))  # Seconds between readiness probes
+HEALTH_STATS_INTERVAL = float(os.getenv("HEALTH_STATS_INTERVAL", "300"))  # Max refresh rate of /health post stats
+HEALTH_STALE_AFTER = 3 * HEALTH_PROBE_INTERVAL  # Readiness results older than this count as failing
+
+class HealthProber:
+    def __init__(self, checks=None):
+        self.checks = dict(checks or {})  # name -> callable returning True/False or raising
+        self._lock = threading.Lock()
+        self._readiness = None
+        self._stats = None
+        self._stats_at = 0.0
+        self._thread = None
+
+    def add_check(self, name, fn):
+        self.checks[name] = fn
+
+    def _probe(self):
+        results = {}
+        for name, fn in self.checks.items():
+            started = time.monotonic()
+            try:
+                ok, error = bool(fn()), None
+            except Exception as e:
+                ok, error = False, str(e)
+            results[name] = {"ok": ok, "ms": round((time.monotonic() - started) * 1000, 1), "error": error}
+        return {"ok": all(r["ok"] for r in results.values()), "checks": results, "checked_at": time.time()}
+
+    def _refresh_stats(self):
+        """Post statistics for /health from the maintained counters"""
+        conn = get_db_connection(retry_count=1)
+        if not conn:
+            return None
+        try:
+            cur = conn.cursor()
+            counts = get_post_counts(cur)
+            cur.execute("SELECT title, date FROM posts ORDER BY date DESC LIMIT 1")
+            row = cur.fetchone()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            print(f"Error querying database in health check: {e}")
+            conn.close()
+            return None
+        return {
+            "total_posts": counts["total"],
+            "published_posts": counts["published"],
+            "posts_24h": counts["posts_24h"],
+            "posts_by_tag": counts["by_tag"],
+            "last_post": {"title": row['title'], "date": row['date'].isoformat()} if row else None,
+            "refreshed_at": time.time(),
+        }
+
+    def run_once(self):
+        readiness = self._probe()
+        stats = None
+        if readiness["checks"].get("database", {}).get("ok") and time.time() - self._stats_at >= HEALTH_STATS_INTERVAL:
+            stats = self._refresh_stats()
+        with self._lock:
+            self._readiness = readiness
+            if stats:
+                self._stats, self._stats_at = stats, stats["refreshed_at"]
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Health probe failed: {e}")
+            time.sleep(HEALTH_PROBE_INTERVAL)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="health-prober", daemon=True)
+            self._thread.start()
+
+    def readiness(self):
+        """Last probe result; not ok when there is none yet or it is stale"""
+        with self._lock:
+            result = self._readiness
+        if result is None:
+            return {"ok": False, "checks": {}, "checked_at": None, "error": "not probed yet"}
+        age = time.time() - result["checked_at"]
+        if age > HEALTH_STALE_AFTER:
+            return {**result, "ok": False, "error": f"last probe {age:.0f}s ago"}
+        return result
+
+    def stats(self):
+        with self._lock:
+            return self._stats
+
+def check_database():
+    conn = get_db_connection(retry_count=1)
+    if not conn:
+        return False
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        return True
+    finally:
+        conn.close()
+
+prober = HealthProber({"database": check_database})
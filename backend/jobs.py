@@ -0,0 +1,297 @@
+"""
+Persistent generation job queue
+Jobs live in the generation_jobs table and are claimed with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of worker threads (across processes and replicas) can share one queue without
+double-running a job. Web requests only enqueue; generation never blocks a Flask worker.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+
+from db import get_db_connection
+from pipeline import PipelineAbort
+from progress import open_stream, get_stream, discard_stream, format_sse
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))  # Seconds between polls when idle
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))  # Running jobs without a heartbeat this long are requeued
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))  # Must stay well below JOB_STALE_SECONDS
+JOB_MAX_ATTEMPTS = 3
+JOB_EVENTS_POLL = 2.0  # Seconds between DB polls when streaming a job that runs in another process
+JOB_TERMINAL_STATUSES = ('succeeded', 'failed')
+
+_wakeup = threading.Event()
+_workers = []
+
+class JobLost(PipelineAbort):
+    """This worker no longer owns its job: it was requeued after missed heartbeats, maybe claimed elsewhere"""
+
+def _job_row(row):
+    job = dict(row)
+    for key in ("created_at", "started_at", "finished_at", "heartbeat_at"):
+        if job.get(key):
+            job[key] = job[key].isoformat()
+    return job
+
+def enqueue_job(kind, params=None):
+    """Queue a job ("post" or "batch"); returns its id or None if the DB is unavailable"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO generation_jobs (kind, params)
+            VALUES (%s, %s)
+            RETURNING id
+        """, (kind, json.dumps(params or {})))
+        job_id = cur.fetchone()['id']
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print(f"❌ Could not enqueue {kind} job: {e}")
+        conn.close()
+        return None
+    # Local workers pick the job up without waiting for a poll. The progress stream is opened by
+    # whichever worker claims the job (run_job), which also closes it; until then subscribers poll the row.
+    _wakeup.set()
+    return job_id
+
+def get_job(job_id):
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM generation_jobs WHERE id = %s", (job_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+        return _job_row(row) if row else None
+    except Exception:
+        conn.close()
+        raise
+
+def claim_job(worker_id):
+    """Atomically move the oldest queued job to running and return it (None if the queue is empty)"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        # Requeue jobs whose worker died mid-run (no heartbeat for JOB_STALE_SECONDS)
+        cur.execute("""
+            UPDATE generation_jobs
+            SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+                error = CASE WHEN attempts < %s THEN error ELSE 'Worker stopped responding' END,
+                finished_at = CASE WHEN attempts < %s THEN NULL ELSE NOW() END
+            WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => %s)
+        """, (JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, JOB_MAX_ATTEMPTS, JOB_STALE_SECONDS))
+        cur.execute("""
+            UPDATE generation_jobs
+            SET status = 'running', worker = %s, attempts = attempts + 1,
+                started_at = NOW(), heartbeat_at = NOW(), progress = '{}'::jsonb
+            WHERE id = (
+                SELECT id FROM generation_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING *
+        """, (worker_id,))
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+        conn.close()
+        return dict(row) if row else None
+    except Exception as e:
+        print(f"⚠️ Job claim failed: {e}")
+        conn.close()
+        return None
+
+def _owned_update(job_id, worker_id, query, params, what, retry_count=3):
+    """Run an UPDATE on a job this worker is running; True if it applied, False if the job is no
+    longer ours (requeued, maybe claimed by another worker), None if the database was unreachable
+    """
+    conn = get_db_connection(retry_count=retry_count)
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute(query + " WHERE id = %s AND worker = %s AND status = 'running'", (*params, job_id, worker_id))
+        owned = cur.rowcount == 1
+        conn.commit()
+        cur.close()
+        conn.close()
+        return owned
+    except Exception as e:
+        print(f"⚠️ Could not {what} for job {job_id}: {e}")
+        conn.close()
+        return None
+
+def heartbeat(job_id, worker_id):
+    """Mark a running job as alive; a job already requeued or claimed by another worker is left alone"""
+    return _owned_update(job_id, worker_id, "UPDATE generation_jobs SET heartbeat_at = NOW()", (), "heartbeat",
+                         retry_count=1)
+
+def _heartbeat_loop(job_id, worker_id, stop, lost):
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        if heartbeat(job_id, worker_id) is False:
+            lost.set()
+            return
+
+def record_stage(job_id, worker_id, name, status, seconds=None):
+    """Store per-stage progress on the job row (also refreshes the worker heartbeat); see _owned_update"""
+    entry = {name: {"status": status, "seconds": round(seconds, 2) if seconds is not None else None}}
+    return _owned_update(job_id, worker_id, """
+        UPDATE generation_jobs
+        SET stage = %s, progress = progress || %s::jsonb, heartbeat_at = NOW()
+    """, (name, json.dumps(entry)), f"record stage {name}")
+
+def finish_job(job_id, worker_id, result, error=None):
+    """Store the outcome; a job that was requeued meanwhile keeps whatever its new owner writes"""
+    return _owned_update(job_id, worker_id, """
+        UPDATE generation_jobs
+        SET status = %s, result = %s, error = %s, finished_at = NOW(), heartbeat_at = NOW()
+    """, ('failed' if error else 'succeeded', json.dumps(result, default=str), error), "finish")
+
+def run_job(job):
+    """Execute one claimed job and store its outcome.
+
+    A timer thread refreshes the heartbeat for the whole run: batch jobs report no stages, and a
+    single slow LLM pass can outlast JOB_STALE_SECONDS, after which the job would be requeued
+    and run a second time by another worker. If that happens anyway, the next stage callback
+    raises JobLost (a PipelineAbort, so nothing is inserted) and the outcome is not recorded.
+    """
+    from bot import publish_post
+    from batch import generate_batch
+
+    job_id = job['id']
+    worker_id = job.get('worker')
+    params = job.get('params') or {}
+    stream = open_stream(f"job:{job_id}")
+    stream_stage, on_token = stream.callbacks()
+    lost = threading.Event()
+
+    def on_stage(name, status, seconds=None):
+        stream_stage(name, status, seconds)
+        if lost.is_set() or record_stage(job_id, worker_id, name, status, seconds) is False:
+            lost.set()
+            raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+
+    stream.publish("started", {"job_id": job_id, "worker": job.get('worker')})
+    print(f"🛠️ Job {job_id} ({job['kind']}) started")
+    stop_heartbeat = threading.Event()
+    threading.Thread(
+        target=_heartbeat_loop, args=(job_id, worker_id, stop_heartbeat, lost), name=f"job-{job_id}-heartbeat", daemon=True
+    ).start()
+    try:
+        if job['kind'] == 'post':
+            result = publish_post(
+                emergency_override=bool(params.get('emergency_override')), on_stage=on_stage, on_token=on_token
+            )
+            error = None if isinstance(result, dict) and result.get("success") else (
+                result.get("error") if isinstance(result, dict) else "publish_post returned unexpected format"
+            )
+        elif job['kind'] == 'batch':
+            result = generate_batch(
+                params.get('count', 1), params.get('concurrency', 1), params.get('categories'),
+                params.get('publish', False), bool(params.get('emergency_override'))
+            )
+            error = None if result.get("success") else result.get("error", "Batch failed")
+        else:
+            result, error = None, f"Unknown job kind: {job['kind']}"
+    except Exception as e:
+        result, error = {"traceback": traceback.format_exc()}, str(e)
+    finally:
+        stop_heartbeat.set()
+    if finish_job(job_id, worker_id, result, error) is False:
+        # Subscribers fall back to the database, where the job's new run reports progress
+        stream.publish("requeued", {"job_id": job_id})
+        stream.close()
+        discard_stream(f"job:{job_id}")
+        print(f"⚠️ Job {job_id} was requeued while {worker_id} ran it; outcome discarded")
+        return
+    stream.publish("done", {"status": "failed" if error else "succeeded", "result": result, "error": error})
+    stream.close()
+    print(f"{'❌' if error else '✅'} Job {job_id} {'failed: ' + error if error else 'succeeded'}")
+
+def _db_events(job, seen):
+    """SSE messages for stage progress stored on the job row that were not streamed yet"""
+    for stage, info in (job.get('progress') or {}).items():
+        key = (stage, info.get('status'))
+        if key not in seen:
+            seen.add(key)
+            yield format_sse("stage", {"stage": stage, **info})
+    if job['status'] in JOB_TERMINAL_STATUSES:
+        yield format_sse("done", {"status": job['status'], "result": job.get('result'), "error": job.get('error')})
+
+def _follow_stream(stream, seen):
+    """Relay a local job stream; returns True once the job is done, False if nobody here is running it"""
+    running_here = stream.has_event("started")
+    for item in stream.iter(timeout=JOB_EVENTS_POLL):
+        if item is None:
+            if not running_here:
+                return False  # Queued or claimed by another process: fall back to the database
+            yield ": keep-alive\n\n"
+            continue
+        event, data = item
+        if event == "requeued":
+            return False  # This process lost the job; follow its next run in the database
+        running_here = running_here or event == "started"
+        if event == "stage":
+            seen.add((data['stage'], data['status']))
+        yield format_sse(event, data)
+        if event == "done":
+            return True
+    return True
+
+def job_event_stream(job_id):
+    """Server-Sent Events for a job: live stage/token events when it runs in this process,
+    stage progress polled from Postgres when another process or replica claimed it.
+    """
+    seen = set()
+    stream = get_stream(f"job:{job_id}")
+    if stream and (yield from _follow_stream(stream, seen)):
+        return
+
+    while True:
+        job = get_job(job_id)
+        if not job:
+            yield format_sse("error", {"error": "Job not found"})
+            return
+        yield from _db_events(job, seen)
+        if job['status'] in JOB_TERMINAL_STATUSES:
+            return
+        stream = get_stream(f"job:{job_id}")
+        if stream and stream.has_event("started") and (yield from _follow_stream(stream, seen)):
+            return
+        yield ": keep-alive\n\n"
+        time.sleep(JOB_EVENTS_POLL)
+
+def _worker_loop(worker_id):
+    while True:
+        job = claim_job(worker_id)
+        if job:
+            run_job(job)
+            continue
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+def start_job_workers(count=JOB_WORKERS):
+    """Start background worker threads for this process (idempotent)"""
+    if _workers:
+        return
+    host = socket.gethostname()
+    for i in range(count):
+        worker_id = f"{host}:{os.getpid()}:{i}"
+        thread = threading.Thread(target=_worker_loop, args=(worker_id,), name=f"job-worker-{i}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+    print(f"🛠️ {count} generation job worker(s) started")
@@ -0,0 +1,267 @@
+"""
+Distributed rate limiting and single-flight execution for post generation
+A lease row in generation_leases makes sure only one generation runs at a time across the
+APScheduler job, scheduler.py, manual triggers and every replica; a one-row token bucket in
+rate_limits replaces the "latest post" sort for the 23-hour limit, and publish_ledger records each run.
+
+Every lease operation is a single-statement transaction, so it behaves the same through
+PgBouncer transaction pooling, where a session-level advisory lock may be taken on one server
+connection and released on another.
+"""
+
+import os
+import socket
+import threading
+import uuid
+
+from db import get_db_connection
+
+PUBLISH_INTERVAL_HOURS = float(os.getenv("PUBLISH_INTERVAL_HOURS", "23"))
+LEASE_SECONDS = int(os.getenv("GENERATION_LEASE_SECONDS", "300"))  # A holder that stops renewing loses the lease after this
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 5
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Tokens refill continuously at one per interval (seconds passed as a parameter), capped at a burst of one
+AVAILABLE_TOKENS = "LEAST(1.0, {t}tokens + EXTRACT(EPOCH FROM (NOW() - {t}updated_at)) / %s)"
+
+def _hours_remaining(cur, name, interval_hours):
+    """Hours until a token is available (0 when one is), O(1) lookup by primary key"""
+    cur.execute(f"""
+        SELECT {AVAILABLE_TOKENS.format(t='')} AS available
+        FROM rate_limits WHERE name = %s
+    """, (interval_hours * 3600, name))
+    row = cur.fetchone()
+    if not row:
+        return 0.0
+    return max(0.0, (1.0 - float(row['available'])) * interval_hours)
+
+def _consume_token(cur, name, interval_hours):
+    cur.execute(f"""
+        INSERT INTO rate_limits (name, tokens, updated_at) VALUES (%s, 0, NOW())
+        ON CONFLICT (name) DO UPDATE
+        SET tokens = GREATEST(0.0, {AVAILABLE_TOKENS.format(t='rate_limits.')} - 1.0),
+            updated_at = NOW()
+    """, (name, interval_hours * 3600))
+
+def _lease_statement(query, params):
+    """Run one lease statement in its own transaction; returns the rowcount, or None if the DB is down"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        count = cur.rowcount
+        conn.commit()
+        cur.close()
+        return count
+    except Exception as e:
+        print(f"⚠️ Lease update failed: {e}")  # close() rolls back before the connection is reused
+        return None
+    finally:
+        conn.close()
+
+def _acquire_lease(name, holder):
+    """1 if taken, 0 if another run holds an unexpired lease, None if the database is down"""
+    return _lease_statement("""
+        INSERT INTO generation_leases (name, holder, expires_at)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s))
+        ON CONFLICT (name) DO UPDATE
+        SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+        WHERE generation_leases.expires_at < NOW()
+    """, (name, holder, LEASE_SECONDS))
+
+def _renew_lease(name, holder, stop):
+    while not stop.wait(LEASE_RENEW_SECONDS):
+        renewed = _lease_statement("""
+            UPDATE generation_leases SET expires_at = NOW() + make_interval(secs => %s)
+            WHERE name = %s AND holder = %s
+        """, (LEASE_SECONDS, name, holder))
+        if renewed == 0:
+            print(f"⚠️ {name} lease expired and was taken over while this run was still going")
+
+def _release_lease(name, holder):
+    if _lease_statement("DELETE FROM generation_leases WHERE name = %s AND holder = %s", (name, holder)) is None:
+        print(f"⚠️ Could not release {name} lease; it expires in at most {LEASE_SECONDS}s")
+
+def _finish_run(name, ledger_id, result, interval_hours):
+    """Consume the token on success and close the ledger row (retried once)"""
+    success = isinstance(result, dict) and bool(result.get("success"))
+    for attempt in range(2):
+        conn = get_db_connection()
+        if not conn:
+            continue
+        try:
+            cur = conn.cursor()
+            if success:
+                _consume_token(cur, name, interval_hours)
+            cur.execute("""
+                UPDATE publish_ledger
+                SET status = %s, post_id = %s, error = %s, finished_at = NOW()
+                WHERE id = %s
+            """, (
+                'succeeded' if success else 'failed',
+                result.get("id") if success else None,
+                None if success else (result.get("error") if isinstance(result, dict) else str(result)),
+                ledger_id,
+            ))
+            conn.commit()
+            cur.close()
+            return
+        except Exception as e:
+            print(f"⚠️ Could not record {name} outcome (attempt {attempt + 1}): {e}")
+        finally:
+            conn.close()
+
+def _open_run(name, interval_hours, bypass_limit):
+    """Check the rate limit and open a ledger row; returns (ledger_id, None) or (None, refusal dict)"""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Database connection failed")
+        return None, {"success": False, "error": "Database connection failed"}
+    try:
+        cur = conn.cursor()
+        if bypass_limit:
+            print("🚨 EMERGENCY OVERRIDE: Bypassing rate limit check")
+        else:
+            remaining = _hours_remaining(cur, name, interval_hours)
+            if remaining > 0:
+                conn.commit()
+                print(f"⏳ Rate limit: Wait {remaining:.1f}h more.")
+                return None, {
+                    "success": False,
+                    "error": f"Rate limit: Must wait {remaining:.1f} hours before next post",
+                    "hours_remaining": remaining
+                }
+            print("✅ Rate limit passed, proceeding with generation...")
+
+        cur.execute("""
+            INSERT INTO publish_ledger (name, status, emergency_override)
+            VALUES (%s, 'running', %s)
+            RETURNING id
+        """, (name, bypass_limit))
+        ledger_id = cur.fetchone()['id']
+        conn.commit()
+        cur.close()
+        return ledger_id, None
+    finally:
+        conn.close()
+
+def _new_holder():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def exclusive(name, fn):
+    """Run fn() while holding the `name` lease, for background work that only one process across
+    workers and replicas should do. Returns None without running fn if the lease is held elsewhere
+    or the database is down.
+    """
+    holder = _new_holder()
+    if not _acquire_lease(name, holder):
+        print(f"🔒 {name} skipped: running elsewhere or database unavailable")
+        return None
+    stop_renewing = threading.Event()
+    threading.Thread(target=_renew_lease, args=(name, holder, stop_renewing), name=f"{name}-lease", daemon=True).start()
+    try:
+        return fn()
+    finally:
+        stop_renewing.set()
+        _release_lease(name, holder)
+
+def _run_locked(name, fn, interval_hours, bypass_limit):
+    holder = _new_holder()
+    acquired = _acquire_lease(name, holder)
+    if acquired is None:
+        print("❌ Database connection failed")
+        return {"success": False, "error": "Database connection failed"}
+    if not acquired:
+        print(f"🔒 {name} already running elsewhere - coalescing into that run")
+        return {"success": False, "coalesced": True, "in_progress": True,
+                "error": "Another generation is already in progress"}
+
+    # Renewed in the background for as long as fn() runs; a crashed process simply stops renewing
+    stop_renewing = threading.Event()
+    threading.Thread(target=_renew_lease, args=(name, holder, stop_renewing), name=f"{name}-lease", daemon=True).start()
+    try:
+        ledger_id, refusal = _open_run(name, interval_hours, bypass_limit)
+        if refusal:
+            return refusal
+        try:
+            result = fn()
+        except Exception as e:
+            _finish_run(name, ledger_id, {"success": False, "error": str(e)}, interval_hours)
+            raise
+        _finish_run(name, ledger_id, result, interval_hours)
+        return result
+    finally:
+        stop_renewing.set()
+        _release_lease(name, holder)
+
+def single_flight(name, fn, interval_hours=PUBLISH_INTERVAL_HOURS, bypass_limit=False):
+    """Run fn() unless the rate limit says no or another run is already in flight.
+
+    Concurrent callers in this process wait for the leader and share its result (marked
+    "coalesced"); callers in other processes get an "in_progress" error dict immediately.
+    bypass_limit skips the token check but still takes the lease and consumes a token.
+    """
+    with _flights_lock:
+        flight = _flights.get(name)
+        leader = flight is None
+        if leader:
+            flight = _flights[name] = _Flight()
+
+    if not leader:
+        print(f"🔁 {name} already running in this process - waiting for its result")
+        flight.done.wait()
+        result = flight.result
+        return {**result, "coalesced": True} if isinstance(result, dict) else result
+
+    try:
+        flight.result = _run_locked(name, fn, interval_hours, bypass_limit)
+        return flight.result
+    except Exception as e:
+        flight.result = {"success": False, "error": str(e)}
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(name, None)
+        flight.done.set()
+
+def limiter_status(name="publish_post", interval_hours=PUBLISH_INTERVAL_HOURS):
+    """Token bucket state and whether a run currently holds the lease"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT updated_at, {AVAILABLE_TOKENS.format(t='')} AS available
+            FROM rate_limits WHERE name = %s
+        """, (interval_hours * 3600, name))
+        row = cur.fetchone()
+        cur.execute("""
+            SELECT EXISTS (
+                SELECT 1 FROM generation_leases WHERE name = %s AND expires_at > NOW()
+            ) AS running
+        """, (name,))
+        running = cur.fetchone()['running']
+        cur.close()
+        conn.close()
+    except Exception:
+        conn.close()
+        raise
+
+    available = float(row['available']) if row else 1.0
+    return {
+        "tokens": round(available, 3),
+        "hours_remaining": max(0.0, (1.0 - available) * interval_hours),
+        "can_post": available >= 1.0 and not running,
+        "in_progress": running,
+        "last_post_time": row['updated_at'].isoformat() if row and row['updated_at'] else None,
+    }
@@ -0,0 +1,522 @@
+"""
+Multi-provider LLM client for the generation pipeline
+Persistent pooled HTTP session per provider, per-provider timeouts and hedged requests:
+if the first provider is slower than its usual latency percentile, a backup provider is
+fired in parallel and the first valid answer wins. Losing calls are cancelled: one still waiting
+on its requests-per-minute budget never sends, and a streaming one closes its connection.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_SYSTEM_PROMPT = "You are a thoughtful content writer creating engaging blog posts."
+
+# Provider order (first configured one is the primary)
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "groq,openai,gemini").split(",") if p.strip()]
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") != "0"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))  # Hedge once a call is slower than this
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30"))  # Used until enough samples exist
+LLM_HEDGE_MIN_SAMPLES = 5
+LLM_FAILURE_COOLDOWN = 300  # Seconds a provider is ranked last after repeated failures
+
+# Content-addressed response cache (only used when a caller passes a cache namespace)
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "wavesignals-llm-cache"))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "50"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "48"))
+
+class RateLimiter:
+    """Token bucket allowing `rpm` requests per minute (bursts up to rpm); rpm <= 0 disables it"""
+
+    def __init__(self, rpm):
+        self.rpm = rpm
+        self._tokens = float(rpm)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=None):
+        """Block until a request may be sent; returns the seconds spent waiting, or None if the
+        cancel event was set meanwhile"""
+        if self.rpm <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.rpm, self._tokens + (now - self._updated) * self.rpm / 60.0)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) * 60.0 / self.rpm
+            if cancel is not None:
+                if cancel.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+            waited += delay
+
+class _Cancelled(Exception):
+    """Another provider answered first"""
+
+class Provider:
+    """One LLM backend with its own keep-alive connection pool and latency history"""
+
+    name = "provider"
+
+    def __init__(self, api_key, model, timeout, rpm=0):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.limiter = RateLimiter(rpm)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8, max_retries=0)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=50)
+        self._consecutive_failures = 0
+        self._last_failure = 0.0
+        self._stats = {"calls": 0, "failures": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def build_request(self, prompt, system, temperature, max_tokens, stream=False):
+        """Return (url, headers, payload)"""
+        raise NotImplementedError
+
+    def parse_response(self, data):
+        """Return (text, usage dict) from the provider's JSON body (or one streamed chunk)"""
+        raise NotImplementedError
+
+    def _read_stream(self, response, on_token, cancel=None):
+        """Consume a `data: {...}` event stream, forwarding text deltas to on_token"""
+        parts = []
+        usage = {}
+        for line in response.iter_lines(decode_unicode=True):
+            if cancel is not None and cancel.is_set():
+                raise _Cancelled()
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            text, chunk_usage = self.parse_response(json.loads(data))
+            if chunk_usage:
+                usage = chunk_usage
+            if text:
+                parts.append(text)
+                on_token(text)
+        return "".join(parts), usage
+
+    def complete(self, prompt, system=DEFAULT_SYSTEM_PROMPT, temperature=0.8, max_tokens=4000, on_token=None,
+                 on_usage=None, cancel=None):
+        """Blocking completion; returns text or None (errors are logged, never raised).
+
+        With on_token the provider's streaming API is used and each text delta is passed on.
+        on_usage(usage) receives the token usage of a successful call. Setting the cancel event
+        abandons the call before it is sent, or mid-stream; a non-streaming request already sent
+        runs to completion.
+        """
+        stream = on_token is not None
+        url, headers, payload = self.build_request(prompt, system, temperature, max_tokens, stream=stream)
+        waited = self.limiter.acquire(cancel)
+        if waited is None or (cancel is not None and cancel.is_set()):
+            return None
+        if waited:
+            print(f"⏳ {self.name} requests-per-minute budget: waited {waited:.1f}s")
+        started = time.monotonic()
+        response = None
+        try:
+            print(f"🔄 Calling {self.name} API{' (streaming)' if stream else ''}...")
+            response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout, stream=stream)
+
+            if response.status_code != 200:
+                print(f"❌ {self.name} API Error: HTTP {response.status_code}")
+                print(f"   Response: {response.text[:300]}")
+                self._record(None, started)
+                return None
+
+            if stream:
+                content, usage = self._read_stream(response, on_token, cancel)
+            else:
+                content, usage = self.parse_response(response.json())
+            if not content:
+                print(f"❌ Unexpected {self.name} response format")
+                self._record(None, started)
+                return None
+
+            self._record(usage, started)
+            if on_usage:
+                on_usage(usage)
+            print(f"✅ {self.name} responded ({len(content)} chars)")
+            return content
+
+        except _Cancelled:
+            response.close()  # Drops the connection, so the provider stops generating for us
+            print(f"⏹️ {self.name} call cancelled, another provider answered first")
+            return None
+        except Exception as e:
+            print(f"❌ {self.name} API Error: {e}")
+            self._record(None, started)
+            return None
+
+    def _record(self, usage, started):
+        with self._lock:
+            self._stats["calls"] += 1
+            if usage is None:
+                self._stats["failures"] += 1
+                self._consecutive_failures += 1
+                self._last_failure = time.monotonic()
+                return
+            self._consecutive_failures = 0
+            self._latencies.append(time.monotonic() - started)
+            self._stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            self._stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    def healthy(self):
+        with self._lock:
+            if self._consecutive_failures < 3:
+                return True
+            return time.monotonic() - self._last_failure > LLM_FAILURE_COOLDOWN
+
+    def latency_percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(pct * len(samples)))]
+
+    def hedge_delay(self):
+        delay = self.latency_percentile(LLM_HEDGE_PERCENTILE)
+        return min(delay if delay is not None else LLM_HEDGE_DEFAULT_DELAY, self.timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "model": self.model,
+            "rpm_budget": self.limiter.rpm,
+            "healthy": self.healthy(),
+            "p50_latency": self.latency_percentile(0.5),
+            "p90_latency": self.latency_percentile(0.9),
+        })
+        return stats
+
+class OpenAICompatibleProvider(Provider):
+    """Chat-completions API (Groq and OpenAI speak the same dialect)"""
+
+    def __init__(self, name, url, api_key, model, timeout, rpm=0):
+        super().__init__(api_key, model, timeout, rpm)
+        self.name = name
+        self.url = url
+
+    def build_request(self, prompt, system, temperature, max_tokens, stream=False):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if stream:
+            payload["stream"] = True
+            # Without this, streamed calls report no usage and token accounting reads zero
+            payload["stream_options"] = {"include_usage": True}
+        return self.url, headers, payload
+
+    def parse_response(self, data):
+        # Groq reports streamed usage under x_groq
+        usage = data.get("usage") or (data.get("x_groq") or {}).get("usage") or {}
+        if not data.get("choices"):
+            return None, usage or None  # The include_usage chunk has no choices, only usage
+        choice = data["choices"][0]
+        if "delta" in choice:
+            return choice["delta"].get("content") or "", usage
+        return choice["message"]["content"], usage
+
+class GeminiProvider(Provider):
+    name = "Gemini"
+
+    def build_request(self, prompt, system, temperature, max_tokens, stream=False):
+        method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:{method}key={self.api_key}"
+        payload = {
+            "systemInstruction": {"parts": [{"text": system}]},
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": temperature, "maxOutputTokens": max_tokens}
+        }
+        return url, {"Content-Type": "application/json"}, payload
+
+    def parse_response(self, data):
+        try:
+            text = data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            return None, None
+        meta = data.get("usageMetadata") or {}
+        return text, {
+            "prompt_tokens": meta.get("promptTokenCount", 0),
+            "completion_tokens": meta.get("candidatesTokenCount", 0)
+        }
+
+class ResponseCache:
+    """Size-bounded on-disk cache of LLM replies, one JSON file per content hash.
+
+    Reads bump the file mtime, so eviction (oldest mtime first) is LRU.
+    """
+
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._size = None  # Computed lazily on first write
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                raise FileNotFoundError(path)
+            with open(path, encoding="utf-8") as f:
+                text = json.load(f)["text"]
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "created": time.time()}, f)
+            os.replace(tmp, path)  # Atomic: readers never see a half-written entry
+            written = os.path.getsize(path)
+        except OSError as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._stats["writes"] += 1
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += written
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 80% of its budget"""
+        target = self.max_bytes * 0.8
+        for _, size, path in sorted(self._entries()):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size_bytes": self._size, "max_bytes": self.max_bytes}
+
+response_cache = ResponseCache(LLM_CACHE_DIR, int(LLM_CACHE_MAX_MB * 1024 * 1024), LLM_CACHE_TTL_HOURS * 3600)
+
+def _build_providers():
+    available = {}
+    if os.getenv("GROQ_API_KEY"):
+        available["groq"] = OpenAICompatibleProvider(
+            "Groq", "https://api.groq.com/openai/v1/chat/completions", os.getenv("GROQ_API_KEY"),
+            os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"), float(os.getenv("GROQ_TIMEOUT", "90")),
+            int(os.getenv("GROQ_RPM", "30"))
+        )
+    if os.getenv("OPENAI_API_KEY"):
+        available["openai"] = OpenAICompatibleProvider(
+            "OpenAI", "https://api.openai.com/v1/chat/completions", os.getenv("OPENAI_API_KEY"),
+            os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"), float(os.getenv("OPENAI_TIMEOUT", "90")),
+            int(os.getenv("OPENAI_RPM", "60"))
+        )
+    if os.getenv("GEMINI_API_KEY"):
+        available["gemini"] = GeminiProvider(
+            os.getenv("GEMINI_API_KEY"), os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+            float(os.getenv("GEMINI_TIMEOUT", "60")), int(os.getenv("GEMINI_RPM", "15"))
+        )
+    return [available[name] for name in LLM_PROVIDERS if name in available]
+
+PROVIDERS = _build_providers()
+
+# Shared by all hedged calls. Losers are cancelled, but a non-streaming request already sent keeps its
+# thread until it returns (at most its provider's timeout), so the pool must cover the calls that can be
+# in flight at once: concurrent pipelines (BATCH_CONCURRENCY, JOB_WORKERS) x 2 overlapping passes x providers.
+# Too small and new hedges queue behind abandoned requests.
+LLM_EXECUTOR_WORKERS = int(os.getenv("LLM_EXECUTOR_WORKERS", "0")) or max(4, 4 * len(PROVIDERS))
+_executor = ThreadPoolExecutor(max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="llm")
+
+# Per-run token counters: callers that need their own figure (batch.py) open one per run id,
+# since the provider stats are shared by every job in the process
+_run_tokens = {}
+_run_tokens_lock = threading.Lock()
+
+def track_tokens(cache_namespace):
+    """Start counting tokens spent by call_llm calls with this cache_namespace"""
+    with _run_tokens_lock:
+        _run_tokens.setdefault(cache_namespace, 0)
+
+def pop_tokens(cache_namespace):
+    """Stop counting and return the tokens spent under cache_namespace since track_tokens"""
+    with _run_tokens_lock:
+        return _run_tokens.pop(cache_namespace, 0)
+
+def _count_tokens(cache_namespace, usage):
+    with _run_tokens_lock:
+        if cache_namespace in _run_tokens:
+            _run_tokens[cache_namespace] += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+def ranked_providers():
+    """Healthy providers first, in configured order"""
+    return sorted(PROVIDERS, key=lambda p: not p.healthy())
+
+def _cache_key(cache_namespace, prompt, system, temperature, max_tokens):
+    return ResponseCache.make_key(
+        cache_namespace, [(p.name, p.model) for p in PROVIDERS], system, prompt, temperature, max_tokens
+    )
+
+def forget_response(prompt, cache_namespace, system=DEFAULT_SYSTEM_PROMPT, temperature=0.8, max_tokens=4000):
+    """Drop a cached reply the caller rejected, so a resumed run asks the model again instead of
+    replaying the same bad output (same arguments as the call_llm that cached it)"""
+    response_cache.delete(_cache_key(cache_namespace, prompt, system, temperature, max_tokens))
+
+def call_llm(prompt, system=DEFAULT_SYSTEM_PROMPT, temperature=0.8, max_tokens=4000, cache_namespace=None,
+             on_token=None):
+    """Hedged completion across all configured providers; returns the first valid text or None.
+
+    With a cache_namespace (e.g. a generation run id) identical calls are answered from the
+    response cache, so retrying a failed run replays its finished passes instantly. Every non-empty
+    reply is cached; a caller that rejects one must call forget_response().
+    on_token(text, provider) streams deltas; a hedged call may stream from two providers at once.
+    """
+    if cache_namespace:
+        key = _cache_key(cache_namespace, prompt, system, temperature, max_tokens)
+        cached = response_cache.get(key)
+        if cached is not None:
+            print(f"♻️ LLM response replayed from cache ({len(cached)} chars)")
+            if on_token:
+                on_token(cached, "cache")
+            return cached
+        result = _call_providers(prompt, system, temperature, max_tokens, on_token,
+                                 on_usage=lambda usage: _count_tokens(cache_namespace, usage))
+        if result:
+            response_cache.put(key, result)
+        return result
+    return _call_providers(prompt, system, temperature, max_tokens, on_token)
+
+def _call_providers(prompt, system, temperature, max_tokens, on_token=None, on_usage=None):
+    queue = ranked_providers()
+    if not queue:
+        print("⚠️ No LLM provider configured (set GROQ_API_KEY, OPENAI_API_KEY or GEMINI_API_KEY)")
+        return None
+
+    pending = {}
+    last_launch = None
+    cancel = threading.Event()  # Set once this call is decided, so the other requests stop
+
+    def launch():
+        nonlocal last_launch
+        provider = queue.pop(0)
+        forward = (lambda text, name=provider.name: on_token(text, name)) if on_token else None
+        future = _executor.submit(provider.complete, prompt, system, temperature, max_tokens, forward, on_usage, cancel)
+        pending[future] = provider
+        last_launch = (provider, time.monotonic())
+
+    launch()
+    try:
+        while pending:
+            timeout = None
+            if queue and LLM_HEDGE_ENABLED:
+                provider, launched_at = last_launch
+                timeout = max(0.0, launched_at + provider.hedge_delay() - time.monotonic())
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                print(f"⏱️ {last_launch[0].name} is slower than usual, hedging with {queue[0].name}...")
+                launch()
+                continue
+
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if result:
+                    return result
+
+            # Everything in flight failed: fall back to the next provider right away
+            if not pending and queue:
+                launch()
+    finally:
+        cancel.set()
+        for future in pending:
+            future.cancel()  # Hedges still queued for a thread never start
+
+    print("❌ All LLM providers failed!")
+    return None
+
+def get_llm_stats():
+    return {p.name: p.stats() for p in PROVIDERS}
+
+def get_llm_cache_stats():
+    return response_cache.stats()
@@ -0,0 +1,172 @@
+"""
+Tolerant JSON extraction for LLM outputs
+JSONScanner walks the text one character at a time from the first "{" and stops at the end of
+that balanced object, so code fences, preambles and trailing chatter never reach the parser.
+While scanning it repairs the defects models commonly produce: raw newlines and tabs inside
+strings, unescaped quotes inside strings (e.g. HTML attributes), trailing or doubled commas,
+mismatched closers and output cut off mid-object. extract_json() then validates the result
+against a per-pass schema; with require_complete=True a cut-off object is an error instead, for
+passes where silently losing the end of the content is worse than failing.
+"""
+
+import json
+
+REQUIRED = object()  # Schema default meaning "missing value is an error"
+MAX_CANDIDATES = 20  # "{" positions tried before giving up
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_AFTER_STRING = set(",:}]")  # A quote followed by one of these ends the string
+
+class JSONExtractError(ValueError):
+    """No usable JSON object in an LLM response"""
+
+class JSONScanner:
+    """Incremental scanner: feed() chunks until it returns True, then text() holds the repaired object"""
+
+    def __init__(self):
+        self.out = []
+        self.stack = []
+        self.started = False
+        self.done = False
+        self.consumed = 0  # Characters fed before the object ended
+        self.in_string = False
+        self.escape = False
+        self.quote_pending = None  # Whitespace seen after a quote whose role is not known yet
+        self.comma_pending = False
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self.done:
+                return True
+            self.consumed += 1
+            self._step(ch)
+        return self.done
+
+    def _step(self, ch):
+        if not self.started:
+            if ch == "{":
+                self.started = True
+                self.stack.append(ch)
+                self.out.append(ch)
+            return
+        if self.quote_pending is not None:
+            if ch.isspace():
+                self.quote_pending += ch
+                return
+            if ch == "," and self.stack[-1] == "{" and not self.quote_pending.endswith(","):
+                self.quote_pending += ","  # In an object a real closing quote + comma is followed by a key
+                return
+            pending, self.quote_pending = self.quote_pending, None
+            if self._closes_string(pending, ch):
+                self.in_string = False
+                self.out.append('"')
+                if pending.rstrip().endswith(","):
+                    self.comma_pending = True
+            else:  # A quote inside the string: keep it, escaped
+                self.out.append('\\"' + "".join(_ESCAPES.get(c, c) for c in pending))
+                self._string_char(ch)
+                return
+        if self.in_string:
+            self._string_char(ch)
+        else:
+            self._structural(ch)
+
+    def _closes_string(self, pending, ch):
+        if "," in pending:
+            return ch in '"}'
+        return ch in _AFTER_STRING
+
+    def _string_char(self, ch):
+        if self.escape:
+            self.escape = False
+            self.out.append(ch)
+        elif ch == "\\":
+            self.escape = True
+            self.out.append(ch)
+        elif ch == '"':
+            self.quote_pending = ""
+        elif ch < " ":
+            self.out.append(_ESCAPES.get(ch, f"\\u{ord(ch):04x}"))
+        else:
+            self.out.append(ch)
+
+    def _structural(self, ch):
+        if ch.isspace():
+            return
+        if ch == ",":
+            self.comma_pending = True  # Emitted only if another value follows
+            return
+        if ch in "}]":
+            self.comma_pending = False  # Trailing comma
+            opener = self.stack.pop()
+            self.out.append(_CLOSERS[opener])  # Mismatched closers are corrected
+            self.done = not self.stack
+            return
+        if self.comma_pending:
+            self.out.append(",")
+            self.comma_pending = False
+        if ch == '"':
+            self.in_string = True
+        elif ch in "{[":
+            self.stack.append(ch)
+        self.out.append(ch)
+
+    def text(self):
+        """The repaired object; an unfinished one (truncated output) is closed off"""
+        if not self.started:
+            raise JSONExtractError("no JSON object found")
+        out = list(self.out)
+        if not self.done:
+            if self.quote_pending is not None or self.in_string:
+                if self.escape:
+                    out.pop()
+                out.append('"')
+            if out[-1] == ":":
+                out.append("null")
+            out.extend(_CLOSERS[opener] for opener in reversed(self.stack))
+        return "".join(out)
+
+def _scan(text, start):
+    scanner = JSONScanner()
+    scanner.feed(text[start:])
+    return scanner
+
+def validate(data, schema):
+    """Check data against {field: (type, default)}; wrong-typed optional fields fall back to their default"""
+    if not isinstance(data, dict):
+        raise JSONExtractError(f"expected an object, got {type(data).__name__}")
+    cleaned = dict(data)
+    for field, (kind, default) in schema.items():
+        value = data.get(field)
+        if isinstance(value, kind) and (value or default is not REQUIRED):
+            continue
+        if kind is list and isinstance(value, str) and value.strip():
+            cleaned[field] = [v.strip() for v in value.split(",") if v.strip()]  # "a, b" for ["a", "b"]
+        elif default is REQUIRED:
+            raise JSONExtractError(f"missing or invalid field '{field}'")
+        else:
+            cleaned[field] = list(default) if isinstance(default, list) else default
+    return cleaned
+
+def extract_json(text, schema=None, require_complete=False):
+    """First JSON object in text that parses (after repair) and satisfies schema.
+
+    require_complete rejects objects that had to be closed off because the response was cut off.
+    """
+    if not text:
+        raise JSONExtractError("empty response")
+    start = text.find("{")
+    errors = []
+    for _ in range(MAX_CANDIDATES):
+        if start == -1:
+            break
+        try:
+            scanner = _scan(text, start)
+            if require_complete and scanner.started and not scanner.done:
+                raise JSONExtractError("response was cut off")
+            data = json.loads(scanner.text(), strict=False)
+            return validate(data, schema) if schema else data
+        except ValueError as e:  # JSONDecodeError and JSONExtractError
+            errors.append(str(e))
+        start = text.find("{", start + 1)
+    raise JSONExtractError(errors[0] if errors else "no JSON object found")
@@ -0,0 +1,229 @@
+"""
+Versioned schema migrations
+Migrations are the numbered .sql files in backend/migrations/, applied in order, each in its own
+transaction, and recorded in schema_migrations with a checksum so edited migrations are caught.
+db.init_db() calls migrate() on startup; when the schema is current that is a single query.
+
+Usage: python migrate.py [--dry-run] [--status] [--check]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from psycopg2 import errors
+
+from db import get_db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+MIGRATION_LOCK_KEY = 0x57414D47  # Transaction-scoped advisory lock serialising each migration across replicas
+
+# Hot read queries and the index each must be able to use (python migrate.py --check)
+INDEX_CHECKS = {
+    "public listing": (
+        "SELECT id, slug, title FROM posts WHERE published = TRUE AND (date, id) < (LOCALTIMESTAMP, 2147483647) "
+        "ORDER BY date DESC, id DESC LIMIT 20",
+        "idx_posts_published_date_id",
+    ),
+    "recent posts": ("SELECT title, date FROM posts ORDER BY date DESC LIMIT 5", "idx_posts_date"),
+    "posts last 24h": ("SELECT COUNT(*) FROM posts WHERE date > NOW() - INTERVAL '24 hours'", "idx_posts_date"),
+    "posts fingerprint": ("SELECT MAX(updated_at) FROM posts", "idx_posts_updated_at"),
+    "post by slug": ("SELECT * FROM posts WHERE slug = 'example'", "posts_slug_key"),
+    "search": (
+        "SELECT id FROM posts WHERE search_vector @@ websearch_to_tsquery('english', 'money')",
+        "idx_posts_search_vector",
+    ),
+    "duplicate title": ("SELECT 1 FROM posts WHERE lower(title) = lower('Example') LIMIT 1", "idx_posts_lower_title"),
+    "near-duplicate candidates": ("SELECT id, minhash FROM posts WHERE lsh_bands && ARRAY[1, 2]::bigint[]", "idx_posts_lsh_bands"),
+    "subscribers": ("SELECT * FROM subscribers ORDER BY created_at DESC LIMIT 50", "idx_subscribers_created_at"),
+    "job queue": (
+        "SELECT id FROM generation_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1",
+        "idx_generation_jobs_queued",
+    ),
+}
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+def load_migrations():
+    """[(version, name, sql, checksum)] sorted by version"""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            sql = f.read().replace("\r\n", "\n")
+        checksum = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        migrations.append((int(match.group(1)), match.group(2), sql, checksum))
+    migrations.sort()
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version numbers in " + MIGRATIONS_DIR)
+    return migrations
+
+def _applied(cur):
+    """{version: checksum}, or None if schema_migrations does not exist yet"""
+    try:
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+    except errors.UndefinedTable:
+        cur.connection.rollback()
+        return None
+    return {row['version']: row['checksum'] for row in cur.fetchall()}
+
+def _plan(applied, migrations):
+    """(pending migrations, versions whose file changed since they were applied)"""
+    pending = [m for m in migrations if m[0] not in applied]
+    changed = [m[0] for m in migrations if m[0] in applied and applied[m[0]] != m[3]]
+    return pending, changed
+
+def _is_applied(cur, version):
+    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+    return cur.fetchone() is not None
+
+def migrate(dry_run=False):
+    """Apply pending migrations; returns the list of versions applied (or that would be),
+    or None when the database is unreachable.
+
+    Each migration transaction first takes pg_advisory_xact_lock and re-checks schema_migrations,
+    so replicas booting together apply every migration exactly once. The lock is transaction-scoped
+    (released by the COMMIT), which holds under PgBouncer transaction pooling where a session
+    lock would not.
+
+    dry_run runs all pending migrations in one transaction and rolls it back, so SQL errors
+    surface without changing anything.
+    """
+    migrations = load_migrations()
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Database connection failed - migrations not run")
+        return None
+
+    try:
+        cur = conn.cursor()
+        applied = _applied(cur) or {}
+        pending, changed = _plan(applied, migrations)
+        if changed:
+            print(f"⚠️ Applied migrations were edited afterwards (checksum mismatch): {changed}")
+        if not pending:
+            conn.rollback()
+            print(f"✅ Database schema current (version {max(applied) if applied else 0})")
+            return []
+
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        if not dry_run:
+            conn.commit()
+
+        done = []
+        for version, name, sql, checksum in pending:
+            label = f"{version:04d}_{name}"
+            try:
+                if not dry_run:
+                    # Another replica may be applying this one right now: wait for it, then skip
+                    cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                    if _is_applied(cur, version):
+                        conn.rollback()
+                        continue
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum),
+                )
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Migration {label} failed: {e}")
+                raise
+            if dry_run:
+                print(f"🧪 Dry run: {label} OK")
+            else:
+                conn.commit()
+                print(f"✅ Applied migration {label}")
+            done.append(version)
+        if dry_run:
+            # Later migrations saw the earlier ones; now undo all of it
+            conn.rollback()
+        return done
+    finally:
+        conn.close()
+
+def migration_status():
+    """Every known migration with whether it is applied and whether its file changed"""
+    migrations = load_migrations()
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    try:
+        cur = conn.cursor()
+        applied = _applied(cur) or {}
+        cur.close()
+    finally:
+        conn.close()
+    return [{
+        "version": version,
+        "name": name,
+        "applied": version in applied,
+        "checksum_ok": applied.get(version, checksum) == checksum,
+    } for version, name, _, checksum in migrations]
+
+def _index_names(plan):
+    names = set()
+    if isinstance(plan, dict):
+        if "Index Name" in plan:
+            names.add(plan["Index Name"])
+        for child in plan.get("Plans", []):
+            names |= _index_names(child)
+    return names
+
+def check_indexes():
+    """EXPLAIN every hot query and report whether the planner picks the expected index.
+
+    Sequential scans are disabled for the check: on a small table Postgres rightly prefers
+    them, and the question here is whether the index is usable, not whether it is needed yet.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    results = {}
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for label, (query, index) in INDEX_CHECKS.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + query)
+            plan = cur.fetchone()['QUERY PLAN']
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = _index_names(plan[0]["Plan"])
+            results[label] = {"index": index, "ok": index in used, "used": sorted(used)}
+        conn.rollback()
+    finally:
+        conn.close()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--dry-run", action="store_true", help="Run pending migrations and roll them back")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN the hot queries and verify index usage")
+    args = parser.parse_args()
+
+    if args.status:
+        for m in migration_status():
+            state = "applied" if m["applied"] else "pending"
+            warning = "" if m["checksum_ok"] else "  ⚠️ file changed since applied"
+            print(f"{m['version']:04d}_{m['name']}: {state}{warning}")
+    elif args.check:
+        results = check_indexes()
+        for label, r in results.items():
+            print(f"{'✅' if r['ok'] else '❌'} {label}: expects {r['index']}, plan uses {r['used'] or 'no index'}")
+        raise SystemExit(0 if all(r["ok"] for r in results.values()) else 1)
+    else:
+        migrate(dry_run=args.dry_run)
@@ -0,0 +1,126 @@
+-- Baseline: everything db.init_db used to create on every start.
+-- Written to be idempotent so it can be recorded against databases that already have these objects.
+
+CREATE TABLE IF NOT EXISTS posts (
+    id SERIAL PRIMARY KEY,
+    slug TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    excerpt TEXT,
+    content TEXT NOT NULL,
+    published BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    author TEXT DEFAULT 'WaveSignals',
+    tags TEXT,
+    meta_description TEXT,
+    keywords TEXT,
+    hashtags TEXT,
+    search_queries TEXT,
+    image TEXT
+);
+
+-- Columns added after the first deployments (formerly add_seo_columns.py / .sql)
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS date TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS meta_description TEXT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS keywords TEXT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS hashtags TEXT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_queries TEXT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS image TEXT;
+
+-- Keyset index for the public listing: WHERE published ORDER BY date DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_posts_published_date_id
+ON posts (date DESC, id DESC) WHERE published = TRUE;
+
+-- Full-text search: weighted tsvector kept current by trigger, indexed with GIN
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION posts_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.keywords, '') || ' ' || coalesce(NEW.tags, '')
+                                         || ' ' || coalesce(NEW.search_queries, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.excerpt, '') || ' ' || coalesce(NEW.meta_description, '')), 'C') ||
+        setweight(to_tsvector('english', regexp_replace(coalesce(NEW.content, ''), '<[^>]+>', ' ', 'g')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts;
+CREATE TRIGGER posts_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, keywords, tags, search_queries, excerpt, meta_description, content
+ON posts FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update();
+
+CREATE INDEX IF NOT EXISTS idx_posts_search_vector ON posts USING GIN (search_vector);
+-- Backfill rows written before the trigger existed
+UPDATE posts SET title = title WHERE search_vector IS NULL;
+
+-- Settings (singleton row)
+CREATE TABLE IF NOT EXISTS settings (
+    id SERIAL PRIMARY KEY,
+    config JSONB DEFAULT '{}'::jsonb
+);
+INSERT INTO settings (id, config)
+SELECT 1, '{}'::jsonb WHERE NOT EXISTS (SELECT 1 FROM settings);
+
+-- Subscribers (formerly fix_subscribers_table.py, which dropped the table)
+CREATE TABLE IF NOT EXISTS subscribers (
+    id SERIAL PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    status TEXT DEFAULT 'active'
+);
+
+-- Trend research cache (bot.get_cached_trends), one row per category per TTL window
+CREATE TABLE IF NOT EXISTS trend_research (
+    category TEXT NOT NULL,
+    bucket BIGINT NOT NULL,
+    data JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (category, bucket)
+);
+
+-- Generation job queue (jobs.py), claimed with FOR UPDATE SKIP LOCKED
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id SERIAL PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'post',
+    status TEXT NOT NULL DEFAULT 'queued',
+    params JSONB DEFAULT '{}'::jsonb,
+    stage TEXT,
+    progress JSONB DEFAULT '{}'::jsonb,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER DEFAULT 0,
+    worker TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    heartbeat_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_queued
+ON generation_jobs (created_at) WHERE status = 'queued';
+
+-- publish_post limiter (limiter.py): one token bucket row per limit plus a run ledger
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- Seed from the latest post so upgrading keeps the current 23-hour window
+INSERT INTO rate_limits (name, tokens, updated_at)
+SELECT 'publish_post', 0, COALESCE(MAX(created_at), CURRENT_TIMESTAMP - INTERVAL '30 days')
+FROM posts
+ON CONFLICT (name) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS publish_ledger (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    emergency_override BOOLEAN DEFAULT FALSE,
+    post_id INTEGER,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
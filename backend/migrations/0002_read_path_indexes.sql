@@ -0,0 +1,11 @@
+-- Indexes for the hot read paths (verified by `python migrate.py --check`)
+
+-- Admin/dashboard listings: ORDER BY date DESC LIMIT n, and "posts in the last 24 hours"
+CREATE INDEX IF NOT EXISTS idx_posts_date ON posts (date DESC);
+
+-- Posts fingerprint for ETags: MAX(updated_at)
+CREATE INDEX IF NOT EXISTS idx_posts_updated_at ON posts (updated_at);
+
+-- /api/subscribers: ORDER BY created_at DESC
+CREATE INDEX IF NOT EXISTS idx_subscribers_created_at ON subscribers (created_at DESC);
+
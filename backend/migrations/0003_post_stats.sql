@@ -0,0 +1,51 @@
+-- Maintained post counters (db.get_post_counts) so dashboards never COUNT(*) the archive.
+-- scope 'all' has one row (key ''), 'tag' one row per tags value, 'day' one row per date::date.
+
+CREATE TABLE IF NOT EXISTS post_stats (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    published BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, key)
+);
+
+CREATE OR REPLACE FUNCTION post_stats_add(p_tag TEXT, p_day DATE, p_published BOOLEAN, p_sign INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO post_stats (scope, key, total, published)
+    VALUES ('all', '', p_sign, CASE WHEN p_published THEN p_sign ELSE 0 END),
+           ('tag', coalesce(p_tag, ''), p_sign, CASE WHEN p_published THEN p_sign ELSE 0 END),
+           ('day', coalesce(to_char(p_day, 'YYYY-MM-DD'), ''), p_sign, CASE WHEN p_published THEN p_sign ELSE 0 END)
+    ON CONFLICT (scope, key) DO UPDATE
+    SET total = post_stats.total + EXCLUDED.total,
+        published = post_stats.published + EXCLUDED.published;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION posts_stats_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM post_stats_add(OLD.tags, OLD.date::date, OLD.published, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM post_stats_add(NEW.tags, NEW.date::date, NEW.published, 1);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS posts_stats_trigger ON posts;
+CREATE TRIGGER posts_stats_trigger
+AFTER INSERT OR DELETE OR UPDATE OF tags, date, published
+ON posts FOR EACH ROW EXECUTE FUNCTION posts_stats_update();
+
+-- Backfill; block writers meanwhile so no change is counted twice or missed
+LOCK TABLE posts IN SHARE ROW EXCLUSIVE MODE;
+DELETE FROM post_stats;
+INSERT INTO post_stats (scope, key, total, published)
+SELECT 'all', '', COUNT(*), COUNT(*) FILTER (WHERE published) FROM posts;
+INSERT INTO post_stats (scope, key, total, published)
+SELECT 'tag', coalesce(tags, ''), COUNT(*), COUNT(*) FILTER (WHERE published) FROM posts GROUP BY 2;
+INSERT INTO post_stats (scope, key, total, published)
+SELECT 'day', coalesce(to_char(date::date, 'YYYY-MM-DD'), ''), COUNT(*), COUNT(*) FILTER (WHERE published)
+FROM posts GROUP BY 2;
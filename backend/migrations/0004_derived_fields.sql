@@ -0,0 +1,11 @@
+-- Publish-time derived fields (enrich.py). Values are computed in Python when a post is written;
+-- rows that predate this migration are filled in by enrich.backfill() at startup.
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS word_count INTEGER;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS reading_minutes INTEGER;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS toc JSONB;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS plain_excerpt TEXT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Lets the backfill find unenriched rows without scanning the table
+CREATE INDEX IF NOT EXISTS idx_posts_missing_content_hash ON posts (id) WHERE content_hash IS NULL;
@@ -0,0 +1,2 @@
+-- Case-insensitive duplicate-title check in the quality gate (quality.title_taken)
+CREATE INDEX IF NOT EXISTS idx_posts_lower_title ON posts (lower(title));
@@ -0,0 +1,10 @@
+-- Near-duplicate detection (similarity.py): MinHash signature plus LSH band buckets per post.
+-- Candidates are found with lsh_bands && <buckets of the new text>, served by the GIN index.
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS minhash BIGINT[];
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS lsh_bands BIGINT[];
+
+CREATE INDEX IF NOT EXISTS idx_posts_lsh_bands ON posts USING GIN (lsh_bands);
+
+-- Existing rows get signatures from enrich.backfill(), which recomputes rows without a content_hash
+UPDATE posts SET content_hash = NULL WHERE minhash IS NULL;
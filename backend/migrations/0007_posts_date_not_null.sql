@@ -0,0 +1,5 @@
+-- posts.date is the keyset column of the public listing ((date, id) < cursor). A NULL date breaks
+-- the cursor and drops the row from every page after the first, so the column must be set.
+UPDATE posts SET date = COALESCE(created_at, updated_at, CURRENT_TIMESTAMP) WHERE date IS NULL;
+ALTER TABLE posts ALTER COLUMN date SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE posts ALTER COLUMN date SET NOT NULL;
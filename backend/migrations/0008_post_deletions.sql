@@ -0,0 +1,21 @@
+-- Deletions for the posts fingerprint (db.read_posts_fingerprint). MAX(updated_at) and the published
+-- count cannot see every delete, so ETags and Last-Modified also carry a deletion counter and time.
+
+ALTER TABLE post_stats ADD COLUMN IF NOT EXISTS deleted BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE post_stats ADD COLUMN IF NOT EXISTS last_deleted_at TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION posts_stats_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM post_stats_add(OLD.tags, OLD.date::date, OLD.published, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM post_stats_add(NEW.tags, NEW.date::date, NEW.published, 1);
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        UPDATE post_stats SET deleted = deleted + 1, last_deleted_at = LOCALTIMESTAMP
+        WHERE scope = 'all' AND key = '';
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- Single-flight leases for limiter.py. Session advisory locks are not reliable behind PgBouncer
+-- transaction pooling (Neon's -pooler host): every statement here is its own transaction.
+CREATE TABLE IF NOT EXISTS generation_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
@@ -0,0 +1,17 @@
+-- Content rewrites for the posts fingerprint (db.read_posts_fingerprint). enrich.backfill rewrites
+-- content (heading ids) without bumping updated_at, so listings need another sign that bodies changed.
+
+ALTER TABLE post_stats ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION posts_revision_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE post_stats SET revision = revision + 1 WHERE scope = 'all' AND key = '';
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- Once per statement: a backfill batch bumps the counter once, not once per row
+DROP TRIGGER IF EXISTS posts_revision_trigger ON posts;
+CREATE TRIGGER posts_revision_trigger
+AFTER UPDATE OF content ON posts
+FOR EACH STATEMENT EXECUTE FUNCTION posts_revision_update();
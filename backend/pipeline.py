@@ -0,0 +1,71 @@
+"""
+Tiny dependency-graph runner for the generation pipeline
+Stages whose inputs are ready run concurrently on a thread pool; per-stage timings are recorded.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class PipelineAbort(Exception):
+    """Raised by a stage to stop the whole pipeline (e.g. the draft came back empty)"""
+
+def _timed(fn, inputs):
+    started = time.monotonic()
+    value = fn(inputs)
+    return value, time.monotonic() - started
+
+def notify_stage(on_stage, name, status, seconds=None):
+    """Call a progress callback without letting its errors break generation.
+
+    A PipelineAbort from the callback is a deliberate stop (e.g. jobs.JobLost) and propagates.
+    """
+    if on_stage is None:
+        return
+    try:
+        on_stage(name, status, seconds)
+    except PipelineAbort:
+        raise
+    except Exception as e:
+        print(f"⚠️ Stage callback failed for {name}: {e}")
+
+def run_pipeline(stages, max_workers=4, on_stage=None):
+    """Run {name: (deps, fn)} where fn(results) gets the finished results of earlier stages.
+
+    Returns (results, timings). A PipelineAbort (or any error) from a stage propagates
+    after cancelling stages that have not started yet. on_stage(name, status, seconds) is
+    called with "started", "finished" or "failed" as stages progress.
+    """
+    results = {}
+    timings = {}
+    remaining = dict(stages)
+    running = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+    try:
+        while remaining or running:
+            for name, (deps, fn) in list(remaining.items()):
+                if all(dep in results for dep in deps):
+                    del remaining[name]
+                    running[executor.submit(_timed, fn, dict(results))] = name
+                    notify_stage(on_stage, name, "started")
+
+            if not running:
+                raise RuntimeError(f"Unsatisfiable stage dependencies: {', '.join(remaining)}")
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception:
+                    notify_stage(on_stage, name, "failed")
+                    raise
+                notify_stage(on_stage, name, "finished", timings[name])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results, timings
+
+def format_timings(timings, total):
+    stages = ", ".join(f"{name} {secs:.1f}s" for name, secs in timings.items())
+    return f"⏱️ Pipeline finished in {total:.1f}s ({stages})"
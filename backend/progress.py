@@ -0,0 +1,87 @@
+"""
+In-process progress streams for generation runs
+A run publishes stage/token events into an EventStream; HTTP Server-Sent Events endpoints and the
+Gradio dashboard iterate over the same stream.
+"""
+
+import json
+import threading
+import time
+
+STREAM_RETENTION_SECONDS = 600  # Keep finished streams around so late subscribers still get the replay
+
+class EventStream:
+    """Append-only event log that any number of readers can follow from the start"""
+
+    def __init__(self):
+        self._events = []
+        self._cond = threading.Condition()
+        self.closed = False
+        self.closed_at = None
+
+    def publish(self, event, data=None):
+        with self._cond:
+            self._events.append((event, data or {}))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self.closed_at = time.monotonic()
+            self._cond.notify_all()
+
+    def has_event(self, event):
+        with self._cond:
+            return any(name == event for name, _ in self._events)
+
+    def iter(self, timeout=15.0):
+        """Yield (event, data) as they arrive; yields None after `timeout` idle seconds (heartbeat)"""
+        position = 0
+        while True:
+            with self._cond:
+                if position >= len(self._events) and not self.closed:
+                    self._cond.wait(timeout)
+                pending = self._events[position:]
+                position += len(pending)
+                finished = self.closed and position >= len(self._events)
+            if not pending and not finished:
+                yield None
+            for item in pending:
+                yield item
+            if finished:
+                return
+
+    def callbacks(self):
+        """(on_stage, on_token) callbacks for generate_content / publish_post that publish here"""
+        def on_stage(name, status, seconds=None):
+            self.publish("stage", {"stage": name, "status": status, "seconds": seconds})
+
+        def on_token(stage, text, provider=None):
+            self.publish("token", {"stage": stage, "text": text, "provider": provider})
+
+        return on_stage, on_token
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+def open_stream(key):
+    """Create (or return the existing) stream for a run key such as "job:42" """
+    with _streams_lock:
+        now = time.monotonic()
+        for old_key in [k for k, s in _streams.items() if s.closed and now - s.closed_at > STREAM_RETENTION_SECONDS]:
+            del _streams[old_key]
+        if key not in _streams:
+            _streams[key] = EventStream()
+        return _streams[key]
+
+def get_stream(key):
+    with _streams_lock:
+        return _streams.get(key)
+
+def discard_stream(key):
+    """Forget a stream before its retention ends (its run was abandoned); current readers still drain it"""
+    with _streams_lock:
+        _streams.pop(key, None)
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,92 @@
+"""
+Quality gate for generated posts (Python port of scripts/quality-gate.js)
+Runs inside the generation pipeline before INSERT, so weak drafts never reach the database.
+Banned phrases and LLM artifacts (formerly reject_patterns in bot._editor_pass) share one compiled
+regex, so the content is scanned once however many phrases there are. Only banned phrases fail the
+gate; artifacts are checked by the editor pass on its raw output, where they mean the rewrite is bad.
+"""
+
+import os
+import re
+
+from db import get_db_connection
+
+QUALITY_MIN_WORDS = int(os.getenv("QUALITY_MIN_WORDS", "600"))
+QUALITY_MIN_TITLE_CHARS = 10
+QUALITY_MIN_HOOK_CHARS = 80  # First paragraph must be a real hook, not a one-line lead-in
+
+# Matched case-insensitively: filler and placeholder phrasing
+BANNED_PHRASES = [
+    "in this article", "this article will", "we will explore", "let us explore",
+    "as an ai", "lorem ipsum", "[paste", "placeholder",
+]
+# Matched exactly: leftovers from the editor pass talking about its own output
+ARTIFACT_PATTERNS = [
+    "Here is", "Here's", "I made", "following changes",
+    "```json", "```", '"title":', '"metaDescription":',
+    "optimized for SEO", "Removed aggressive", "Added formatting",
+]
+
+def _alternation(phrases):
+    # Longest first so "```json" wins over "```" at the same position
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+PHRASE_SCANNER = re.compile(
+    f"(?P<artifact>{_alternation(ARTIFACT_PATTERNS)})|(?P<banned>(?i:{_alternation(BANNED_PHRASES)}))"
+)
+FIRST_PARAGRAPH = re.compile(r"<p\b[^>]*>(.*?)</p\s*>", re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r"<[^>]+>")
+
+def scan_phrases(content):
+    """{"artifact": [...], "banned": [...]} of distinct phrases found, in order of appearance"""
+    found = {"artifact": [], "banned": []}
+    for match in PHRASE_SCANNER.finditer(content or ""):
+        kind = match.lastgroup
+        phrase = match.group(kind) if kind == "artifact" else match.group(kind).lower()
+        if phrase not in found[kind]:
+            found[kind].append(phrase)
+    return found
+
+def has_hook(content):
+    match = FIRST_PARAGRAPH.search(content or "")
+    first = TAG.sub("", match.group(1)).strip() if match else ""
+    return len(first) >= QUALITY_MIN_HOOK_CHARS and not first.endswith(":")
+
+def title_taken(title):
+    """True if a post with this title exists (case-insensitive, served by idx_posts_lower_title)"""
+    conn = get_db_connection(retry_count=1)
+    if not conn:
+        print("⚠️ Quality gate: duplicate title check skipped, database unavailable")
+        return False
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM posts WHERE lower(title) = lower(%s) LIMIT 1", (title,))
+        taken = cur.fetchone() is not None
+        cur.close()
+        return taken
+    finally:
+        conn.close()
+
+def check(title, content, word_count=None, check_duplicates=True):
+    """List of reasons to reject the post; empty means it passes.
+
+    word_count can be passed in when it is already known (enrich.derive computes it).
+    """
+    errors = []
+    if not title or len(title) < QUALITY_MIN_TITLE_CHARS:
+        errors.append("Title too short")
+    elif check_duplicates and title_taken(title):
+        errors.append("Duplicate title")
+
+    if word_count is None:
+        word_count = len(TAG.sub(" ", content or "").split())
+    if word_count < QUALITY_MIN_WORDS:
+        errors.append(f"Word count too low ({word_count})")
+
+    if not has_hook(content):
+        errors.append("Weak or missing hook paragraph")
+
+    banned = scan_phrases(content)["banned"]
+    if banned:
+        errors.append(f"Contains banned / placeholder phrases: {', '.join(banned)}")
+    return errors
@@ -0,0 +1,155 @@
+"""
+Response encoding: orjson-backed JSON and negotiated gzip/brotli compression
+ORJSONProvider replaces Flask's json provider (datetimes are encoded natively as ISO 8601 UTC
+instead of going through the default hook), json_response streams payloads with long lists
+piecewise, and init_compression compresses text responses above COMPRESS_MIN_BYTES - streamed
+ones chunk by chunk. orjson and brotli are optional: without them the stdlib encoder and gzip are used.
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # Smaller bodies are sent as-is
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))  # 4-6 is the speed/size sweet spot for dynamic bodies
+JSON_STREAM_MIN_ITEMS = int(os.getenv("JSON_STREAM_MIN_ITEMS", "200"))  # Lists at least this long are encoded while sending
+JSON_STREAM_CHUNK = 50  # List items encoded per yielded chunk
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/xml", "application/rss+xml",
+    "application/atom+xml", "application/javascript", "image/svg+xml",
+}
+# Never buffered or compressed: each event has to reach the client as soon as it is written
+UNCOMPRESSED_TYPES = {"text/event-stream"}
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; naive datetimes from Postgres are treated as UTC"""
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False):
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {"indent", "separators"}:  # e.g. cls=, which orjson has no equivalent for
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, indent=bool(kwargs.get("indent"))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s) if not kwargs else super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+def init_json(app):
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+    else:
+        print("ℹ️ orjson not installed, using the default JSON encoder")
+
+def _encoder(provider):
+    if isinstance(provider, ORJSONProvider):
+        return provider.dumps_bytes
+    return lambda value: provider.dumps(value, separators=(",", ":")).encode()
+
+def iter_json(payload, encode):
+    """Encode a dict piecewise: list values are emitted JSON_STREAM_CHUNK items at a time"""
+    yield b"{"
+    for i, (key, value) in enumerate(payload.items()):
+        yield (b"," if i else b"") + encode(key) + b":"
+        if not isinstance(value, list):
+            yield encode(value)
+            continue
+        yield b"["
+        for start in range(0, len(value), JSON_STREAM_CHUNK):
+            chunk = b",".join(encode(item) for item in value[start:start + JSON_STREAM_CHUNK])
+            yield (b"," if start else b"") + chunk
+        yield b"]"
+    yield b"}\n"
+
+def json_response(payload):
+    """Like jsonify(payload), but streams the body when it holds a long list"""
+    if any(isinstance(v, list) and len(v) >= JSON_STREAM_MIN_ITEMS for v in payload.values()):
+        body = iter_json(payload, _encoder(current_app.json))
+        return current_app.response_class(body, mimetype="application/json")
+    return current_app.json.response(payload)
+
+def _compressor(encoding):
+    """(compress(chunk), finish()) for a streaming encoder"""
+    if encoding == "br":
+        c = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        return c.process, c.finish
+    c = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    return c.compress, c.flush
+
+def _compress_stream(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+def _compress_body(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, COMPRESS_GZIP_LEVEL, mtime=0)
+
+def _compressible(response):
+    mimetype = response.mimetype or ""
+    if mimetype in UNCOMPRESSED_TYPES:
+        return False
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+def init_compression(app):
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    @app.after_request
+    def compress_response(response):
+        if (not _compressible(response) or response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough or "Content-Encoding" in response.headers):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(offered)
+        if not encoding or request.method == "HEAD":
+            return response
+
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < COMPRESS_MIN_BYTES:
+                return response
+            response.set_data(_compress_body(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        # The bytes now differ per encoding, so the validator may only claim weak equivalence
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,132 @@
+"""
+Near-duplicate detection with MinHash + LSH
+Each post gets a MinHash signature over its 3-word shingles (posts.minhash) and LSH band buckets
+(posts.lsh_bands, GIN-indexed), computed at write time by enrich.derive. A new text is compared
+only with posts sharing at least one bucket - an index lookup, not a scan of the archive -
+and those candidates are ranked by estimated Jaccard similarity.
+
+Signatures use one-permutation hashing: each shingle is hashed once and lands in one of
+MINHASH_PERMUTATIONS bins, so signing a post costs one pass over its shingles.
+
+Usage: python similarity.py [--threshold 0.4]   (reports near-duplicate pairs already in the archive)
+"""
+
+import argparse
+import hashlib
+import os
+import re
+
+from db import get_db_connection
+
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 126
+LSH_ROWS = 3  # Rows per band; 42 bands of 3 put the LSH threshold near (1/42)^(1/3) ~ 0.29
+LSH_BANDS = MINHASH_PERMUTATIONS // LSH_ROWS
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.4"))  # Estimated Jaccard that counts as a duplicate
+
+TAG = re.compile(r"<[^>]+>")
+WORD = re.compile(r"[a-z0-9']+")
+
+class DuplicateContent(Exception):
+    """Raised when a draft is too close to a post already in the archive"""
+
+    def __init__(self, match):
+        super().__init__(f"Near-duplicate of '{match['title']}' ({match['similarity']:.0%} similar)")
+        self.match = match
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+def shingles(text):
+    words = WORD.findall(TAG.sub(" ", text or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+def signature(text):
+    """MinHash signature (MINHASH_PERMUTATIONS ints below 2**57), or None for empty text"""
+    bins = [None] * MINHASH_PERMUTATIONS
+    for shingle in shingles(text):
+        h = _hash64(shingle)
+        slot, value = h % MINHASH_PERMUTATIONS, h // MINHASH_PERMUTATIONS
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    if all(b is None for b in bins):
+        return None
+    # Densify: an empty bin borrows the next filled bin's value, salted by the distance
+    filled = list(bins)
+    for i, value in enumerate(filled):
+        if value is None:
+            distance = next(d for d in range(1, MINHASH_PERMUTATIONS) if filled[(i + d) % MINHASH_PERMUTATIONS] is not None)
+            bins[i] = _hash64(f"{filled[(i + distance) % MINHASH_PERMUTATIONS]}:{distance}") >> 7
+    return bins
+
+def lsh_bands(sig):
+    """One signed 64-bit bucket id per band; the band number is part of the hash"""
+    return [
+        int.from_bytes(hashlib.blake2b(f"{band}:{sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]}".encode(),
+                                       digest_size=8).digest(), "big", signed=True)
+        for band in range(LSH_BANDS)
+    ]
+
+def estimate(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def find_similar(sig, buckets=None, threshold=DUPLICATE_THRESHOLD, exclude_id=None, limit=5):
+    """Posts whose estimated similarity to sig is at least threshold, most similar first"""
+    if sig is None:
+        return []
+    conn = get_db_connection(retry_count=1)
+    if not conn:
+        print("⚠️ Duplicate check skipped, database unavailable")
+        return []
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, slug, title, minhash FROM posts
+            WHERE lsh_bands && %s::bigint[] AND id IS DISTINCT FROM %s
+        """, (buckets or lsh_bands(sig), exclude_id))
+        candidates = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+    matches = [
+        {"id": row['id'], "slug": row['slug'], "title": row['title'], "similarity": round(estimate(sig, row['minhash']), 3)}
+        for row in candidates if row['minhash']
+    ]
+    matches = [m for m in matches if m["similarity"] >= threshold]
+    return sorted(matches, key=lambda m: m["similarity"], reverse=True)[:limit]
+
+def ensure_novel(text, threshold=DUPLICATE_THRESHOLD):
+    """Raise DuplicateContent if text is a near-duplicate of an archived post"""
+    matches = find_similar(signature(text), threshold=threshold, limit=1)
+    if matches:
+        raise DuplicateContent(matches[0])
+
+def report(threshold=DUPLICATE_THRESHOLD):
+    """Print near-duplicate pairs already in the archive"""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Database connection failed")
+        return
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id, title, minhash, lsh_bands FROM posts WHERE minhash IS NOT NULL ORDER BY id")
+        posts = cur.fetchall()
+        cur.close()
+    finally:
+        conn.close()
+    pairs = 0
+    for post in posts:
+        for match in find_similar(post['minhash'], post['lsh_bands'], threshold, exclude_id=post['id']):
+            if match["id"] > post['id']:
+                pairs += 1
+                print(f"🔁 {match['similarity']:.0%}  #{post['id']} {post['title']}  <->  #{match['id']} {match['title']}")
+    print(f"{'✅' if not pairs else '⚠️'} {pairs} near-duplicate pair(s) among {len(posts)} posts")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report near-duplicate posts")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    args = parser.parse_args()
+    report(args.threshold)
@@ -0,0 +1,79 @@
+"""
+Deferred application startup
+In lazy mode (STARTUP_MODE=lazy, the default) the slow parts of boot - migrations, the scheduler,
+job workers - run on a background thread so the web server starts listening immediately.
+Each step's outcome is tracked, so readiness can be reported separately from liveness.
+"""
+
+import os
+import threading
+import time
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")  # "eager" runs every step before the import returns
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "10"))  # Backoff between retries of failed steps
+
+class Startup:
+    """Ordered startup steps; a step fails if it raises or returns False and is retried until it succeeds"""
+
+    def __init__(self):
+        self._steps = []
+        self._status = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started_at = None
+
+    def step(self, name, fn):
+        self._steps.append((name, fn))
+        self._status[name] = {"status": "pending", "seconds": None, "error": None, "attempts": 0}
+
+    def _run_step(self, name, fn):
+        with self._lock:
+            self._status[name].update(status="running", attempts=self._status[name]["attempts"] + 1)
+        started = time.monotonic()
+        try:
+            ok = fn() is not False
+            error = None if ok else "step reported failure"
+        except Exception as e:
+            ok, error = False, str(e)
+        seconds = round(time.monotonic() - started, 3)
+        with self._lock:
+            self._status[name].update(status="ok" if ok else "failed", seconds=seconds, error=error)
+        print(f"{'✅' if ok else '⚠️'} Startup step {name} {'done' if ok else 'failed: ' + error} ({seconds}s)")
+        return ok
+
+    def run(self):
+        """Run every step once, then keep retrying the failed ones (e.g. the DB was down at boot)"""
+        failed = [(name, fn) for name, fn in self._steps if not self._run_step(name, fn)]
+        delay = STARTUP_RETRY_SECONDS
+        while failed:
+            time.sleep(delay)
+            failed = [(name, fn) for name, fn in failed if not self._run_step(name, fn)]
+            delay = min(delay * 2, 300)
+
+    def start(self, mode=STARTUP_MODE):
+        """Run the steps inline (eager) or on a daemon thread (lazy); idempotent"""
+        if self.started_at is not None:
+            return
+        self.started_at = time.time()
+        if mode == "eager":
+            self.run()
+            return
+        self._thread = threading.Thread(target=self.run, name="startup", daemon=True)
+        self._thread.start()
+        print("🚀 Startup deferred to background (STARTUP_MODE=lazy)")
+
+    def ready(self):
+        with self._lock:
+            return bool(self._status) and all(s["status"] == "ok" for s in self._status.values())
+
+    def status(self):
+        with self._lock:
+            steps = {name: dict(s) for name, s in self._status.items()}
+        return {
+            "ready": all(s["status"] == "ok" for s in steps.values()) and bool(steps),
+            "mode": STARTUP_MODE,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else None,
+            "steps": steps,
+        }
+
+startup = Startup()
@@ -0,0 +1,60 @@
+"""
+Bulk import upserts
+Re-importing a post whose NDJSON line has no date must keep its publish date. The database test
+runs against TEST_DATABASE_URL (a database migrated with migrate.py) inside a transaction that is
+rolled back, and is skipped when that variable is not set.
+
+Run: python test_bulk.py   (or via pytest)
+"""
+import json
+import os
+import sys
+from datetime import datetime
+
+import bulk
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+def _row(date=None):
+    record = {"slug": "bulk-date-test", "title": "Bulk date test", "content": "<p>Body</p>"}
+    if date:
+        record["date"] = date
+    return bulk.normalize(json.loads(json.dumps(record)))
+
+def test_row_template_matches_params():
+    params = bulk._params(_row())
+    assert bulk.ROW_TEMPLATE.count("%s") == len(params)
+    assert params[bulk._DATE_END] == "bulk-date-test"  # Slug for the date fallback follows date
+
+def test_upsert_without_date_keeps_date():
+    if not TEST_DATABASE_URL:
+        if "pytest" in sys.modules:
+            import pytest
+            pytest.skip("TEST_DATABASE_URL not set")
+        return "skipped"
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(TEST_DATABASE_URL, cursor_factory=RealDictCursor)
+    try:
+        cur = conn.cursor()
+        summary = {"inserted": 0, "updated": 0, "failed": 0, "duplicates": 0, "errors": []}
+        bulk._upsert_batch(cur, [(1, _row("2020-05-01T09:30:00"))], summary)
+        bulk._upsert_batch(cur, [(1, _row())], summary)
+        cur.execute("SELECT date FROM posts WHERE slug = 'bulk-date-test'")
+        assert cur.fetchone()["date"] == datetime(2020, 5, 1, 9, 30)
+        assert (summary["inserted"], summary["updated"], summary["failed"]) == (1, 1, 0), summary
+    finally:
+        conn.rollback()
+        conn.close()
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_row_template_matches_params, test_upsert_without_date_keeps_date):
+        try:
+            outcome = test()
+            print(f"{'⏭️' if outcome == 'skipped' else '✅'} {test.__name__}{' (set TEST_DATABASE_URL)' if outcome else ''}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
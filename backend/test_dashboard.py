@@ -4,8 +4,7 @@ Shows test buttons and error console for debugging
 """
 
 import gradio as gr
-from bot import publish_post, PILLARS
-from db import get_db_connection, init_db
+from db import get_db_connection, get_post_counts
 import os
 from datetime import datetime
 import traceback
@@ -18,8 +17,7 @@ def test_database():
             return "❌ Database connection failed\n\nCheck DATABASE_URL secret in HF Space settings"
         
         cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) as count FROM posts")
-        count = cur.fetchone()['count']
+        count = get_post_counts(cur)["total"]
         cur.close()
         conn.close()
         
@@ -55,6 +53,7 @@ def test_blog_generation():
     try:
         yield "🚀 Starting blog generation...\n\nThis will take 30-60 seconds.\n", ""
         
+        from bot import publish_post  # Imported on first use to keep the Space's boot fast
         result = publish_post()
         
         if isinstance(result, dict) and result.get("success"):
@@ -118,11 +117,9 @@ def get_system_status():
         conn = get_db_connection()
         if conn:
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) as count FROM posts")
-            total_posts = cur.fetchone()['count']
-            
-            cur.execute("SELECT COUNT(*) as count FROM posts WHERE date > NOW() - INTERVAL '24 hours'")
-            posts_24h = cur.fetchone()['count']
+            counts = get_post_counts(cur)
+            total_posts = counts["total"]
+            posts_24h = counts["posts_24h"]
             
             cur.close()
             conn.close()
@@ -228,14 +225,16 @@ with gr.Blocks(title="WaveSignals Testing Console", theme=gr.themes.Soft()) as a
         
         All these work even without this UI:
         - `GET /` - Status
-        - `GET /health` - Health check
+        - `GET /health` - Health check (cached snapshot)
+        - `GET /livez` - Liveness (keep-alive pings)
+        - `GET /readyz` - Readiness (database + scheduler)
         - `GET /api/posts` - List posts
         - `POST /api/generate-post` - Generate post (needs X-Admin-Key header)
         
         ### Next Steps
         
         After all tests pass:
-        1. Setup cron-job.org to ping `/health` every 5 min
+        1. Setup cron-job.org to ping `/livez` every 5 min
         2. Configure GitHub Actions
         3. Test admin panel at your Netlify site
         """)
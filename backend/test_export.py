@@ -0,0 +1,92 @@
+"""
+Static export against an in-memory post table
+Runs export.export_site twice with a fake connection standing in for Postgres and checks that
+deleted posts lose their pages (also with --full) and that tag directories never move.
+
+Run: python test_export.py   (or via pytest)
+"""
+import datetime
+import os
+import sys
+import tempfile
+
+import export
+
+class FakeCursor:
+    def __init__(self, posts):
+        self.posts = posts
+        self.rows = []
+        self.itersize = None
+
+    def execute(self, query, params=None):
+        published = [p for p in self.posts if p.get("published", True)]
+        if "post_stats" in query:
+            self.rows = [{"key": tag} for tag in sorted({p["tags"] for p in published})]
+        else:
+            self.rows = sorted(published, key=lambda p: p["date"], reverse=True)
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, posts):
+        self.posts = posts
+
+    def cursor(self, name=None):
+        return FakeCursor(self.posts)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def _post(slug, tags, day):
+    return {"slug": slug, "title": f"Post {slug}", "excerpt": "", "content": f"<p>{slug}</p>", "content_hash": None,
+            "date": datetime.datetime(2026, 1, day), "tags": tags, "meta_description": "", "keywords": None, "hashtags": None}
+
+def _export(out_dir, posts, full=False):
+    export.get_db_connection = lambda *a, **k: FakeConnection(posts)
+    return export.export_site(out_dir, page_size=10, full=full)
+
+def _tag_dirs(out_dir):
+    return sorted(os.listdir(os.path.join(out_dir, "tags")))
+
+def test_full_export_removes_deleted_posts():
+    with tempfile.TemporaryDirectory() as out_dir:
+        posts = [_post("kept", "Money", 1), _post("gone", "Money", 2)]
+        _export(out_dir, posts)
+        assert os.path.exists(os.path.join(out_dir, "posts", "gone", "index.html"))
+
+        summary = _export(out_dir, posts[:1], full=True)
+        assert summary["removed"] == 1
+        assert not os.path.exists(os.path.join(out_dir, "posts", "gone"))
+        assert os.path.exists(os.path.join(out_dir, "posts", "kept", "index.html"))
+
+def test_tag_directories_are_stable():
+    with tempfile.TemporaryDirectory() as out_dir:
+        _export(out_dir, [_post("plus", "C++", 1)])
+        assert _tag_dirs(out_dir) == ["c"]
+
+        # "C" sorts before "C++" and slugifies alike; it must not take over /tags/c/
+        _export(out_dir, [_post("plus", "C++", 1), _post("plain", "C", 2)], full=True)
+        assert _tag_dirs(out_dir) == ["c", "c-2"]
+        with open(os.path.join(out_dir, "tags", "c", "index.html"), encoding="utf-8") as f:
+            assert "Post plus" in f.read()
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_full_export_removes_deleted_posts, test_tag_directories_are_stable):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)